@@ -0,0 +1,295 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from telegram.error import Forbidden, RetryAfter, TelegramError
+
+
+# ========================================
+# ПОДПИСКИ НА БУМАГИ
+# ========================================
+
+# Виды подписок
+YIELD_ABOVE = 0
+YIELD_BELOW = 1
+COUPON_SOON = 2
+
+
+class AlertBook:
+    """
+    Подписки пользователей на бумаги в виде плоских массивов,
+    сгруппированных (отсортированных) по SECID.
+
+    На каждом новом снимке все условия проверяются одним векторным проходом:
+    значения из снимка берутся один раз на бумагу, а не на подписку.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+
+        # Запись на диск - в одном отдельном потоке: не блокирует event loop,
+        # а файлы пишутся в том же порядке, в каком вызывался save()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='alerts')
+
+        self.secids = np.empty(0, dtype=object)
+        self.chat_ids = np.empty(0, dtype=np.int64)
+        self.kinds = np.empty(0, dtype=np.int8)
+        self.thresholds = np.empty(0, dtype=np.float64)
+
+        # Условие доходности срабатывает при пересечении порога: после
+        # уведомления подписка "взводится" снова, только когда условие перестало выполняться
+        self.armed = np.empty(0, dtype=bool)
+
+        # Дата купона, о котором уже напомнили
+        self.notified = np.empty(0, dtype='datetime64[D]')
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.secids)
+
+    def add(self, chat_id, secid, kind, threshold=np.nan):
+        """
+        Добавление подписки; такая же подписка заменяется новой
+        """
+        self.remove(chat_id, secid, kind)
+
+        pos = np.searchsorted(self.secids.astype(str), secid, side='right')
+
+        self.secids = np.insert(self.secids, pos, secid)
+        self.chat_ids = np.insert(self.chat_ids, pos, chat_id)
+        self.kinds = np.insert(self.kinds, pos, kind)
+        self.thresholds = np.insert(self.thresholds, pos, threshold)
+        self.armed = np.insert(self.armed, pos, True)
+        self.notified = np.insert(self.notified, pos, np.datetime64('NaT'))
+
+        self.save()
+
+    def remove(self, chat_id, secid=None, kind=None):
+        """
+        Удаление подписок чата: всех, по бумаге или по бумаге и виду.
+        Возвращает число удалённых подписок
+        """
+        mask = self.chat_ids == chat_id
+        if secid is not None:
+            mask &= self.secids == secid
+        if kind is not None:
+            mask &= self.kinds == kind
+
+        removed = int(mask.sum())
+        if removed:
+            self._keep(~mask)
+            self.save()
+        return removed
+
+    def _keep(self, keep):
+        self.secids = self.secids[keep]
+        self.chat_ids = self.chat_ids[keep]
+        self.kinds = self.kinds[keep]
+        self.thresholds = self.thresholds[keep]
+        self.armed = self.armed[keep]
+        self.notified = self.notified[keep]
+
+    def for_chat(self, chat_id):
+        """
+        Подписки чата: список (SECID, вид, порог)
+        """
+        mask = self.chat_ids == chat_id
+        return list(zip(self.secids[mask], self.kinds[mask], self.thresholds[mask]))
+
+    def evaluate(self, snapshot, coupon_days=3, today=None):
+        """
+        Проверка всех подписок по снимку. Возвращает список (chat_id, текст)
+        """
+        if not len(self):
+            return []
+
+        today = np.datetime64(pd.Timestamp.now().date() if today is None else pd.Timestamp(today).date(), 'D')
+
+        # Значения из снимка - один раз на каждую бумагу
+        unique, inverse = np.unique(self.secids.astype(str), return_inverse=True)
+        positions = np.array([snapshot.position(secid) for secid in unique], dtype=object)
+        found = np.array([pos is not None for pos in positions], dtype=bool)
+        rows = np.where(found, positions, 0).astype(np.int64)
+
+        df = snapshot.df
+        yields = np.where(found, df['YIELDCLOSE'].to_numpy(dtype=float)[rows], np.nan)[inverse]
+        next_coupon = pd.to_datetime(df['NEXTCOUPON'], errors='coerce').to_numpy(dtype='datetime64[D]')[rows]
+        next_coupon = np.where(found, next_coupon, np.datetime64('NaT'))[inverse]
+        coupon_value = np.where(found, df['COUPONVALUE'].to_numpy(dtype=float)[rows], np.nan)[inverse]
+
+        # Пороги доходности
+        condition = (
+            ((self.kinds == YIELD_ABOVE) & (yields >= self.thresholds))
+            | ((self.kinds == YIELD_BELOW) & (yields <= self.thresholds))
+        )
+        fire_yield = condition & self.armed
+        # Без доходности (NaN) состояние не меняется: иначе сработавшая
+        # подписка взвелась бы и повторила уведомление, когда данные вернутся
+        self.armed = np.where(np.isnan(yields), self.armed, ~condition)
+
+        # Близкий купон
+        days_left = (next_coupon - today).astype(float)
+        days_left[np.isnat(next_coupon)] = np.nan
+        fire_coupon = (
+            (self.kinds == COUPON_SOON)
+            & (days_left >= 0) & (days_left <= coupon_days)
+            & (self.notified != next_coupon)
+        )
+        self.notified = np.where(fire_coupon, next_coupon, self.notified)
+
+        notifications = []
+        for i in np.flatnonzero(fire_yield):
+            side = "выше" if self.kinds[i] == YIELD_ABOVE else "ниже"
+            notifications.append((
+                int(self.chat_ids[i]),
+                f"🔔 <b>{self.secids[i]}</b>: доходность {yields[i]:.2f}% {side} порога {self.thresholds[i]:.2f}%",
+            ))
+        for i in np.flatnonzero(fire_coupon):
+            coupon_date = pd.Timestamp(next_coupon[i]).strftime('%d.%m.%Y')
+            notifications.append((
+                int(self.chat_ids[i]),
+                f"📅 <b>{self.secids[i]}</b>: купон {coupon_value[i]:.2f} ₽ через {int(days_left[i])} дн. ({coupon_date})",
+            ))
+
+        if notifications:
+            self.save()
+        return notifications
+
+    def save(self):
+        """
+        Сохранение подписок на диск (если задан путь).
+        Внутри event loop запись уходит в поток хранилища
+        """
+        if self.path is None:
+            return
+
+        # Массивы не меняются на месте, а заменяются - достаточно запомнить текущие
+        arrays = {
+            'secids': self.secids,
+            'chat_ids': self.chat_ids,
+            'kinds': self.kinds,
+            'thresholds': self.thresholds,
+            'armed': self.armed,
+            'notified': self.notified,
+        }
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(arrays)
+            return
+
+        future = loop.run_in_executor(self._executor, self._write, arrays)
+        future.add_done_callback(self._report_save_error)
+
+    def _write(self, arrays):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, **{**arrays, 'secids': arrays['secids'].astype(str)})
+        os.replace(tmp_path, self.path)
+
+    def _report_save_error(self, future):
+        if future.exception() is not None:
+            print(f"Ошибка сохранения подписок {self.path}: {future.exception()}")
+
+    def flush(self):
+        """
+        Ожидание записи всех сохранений, отправленных в поток
+        """
+        self._executor.submit(lambda: None).result()
+
+    def load(self):
+        try:
+            with np.load(self.path) as data:
+                self.secids = data['secids'].astype(object)
+                self.chat_ids = data['chat_ids']
+                self.kinds = data['kinds']
+                self.thresholds = data['thresholds']
+                self.armed = data['armed']
+                self.notified = data['notified']
+        except Exception as e:
+            print(f"Не удалось прочитать подписки {self.path}: {e}")
+
+
+# ========================================
+# ПАКЕТНАЯ ОТПРАВКА УВЕДОМЛЕНИЙ
+# ========================================
+
+class AlertSender:
+    """
+    Отправка пачки уведомлений с соблюдением лимитов Telegram.
+
+    Уведомления одному чату склеиваются в одно сообщение, поэтому за один
+    проход чат получает не больше одного сообщения. Сообщения разным чатам
+    идут не чаще global_rate в секунду; на 429 ждём retry_after и повторяем.
+
+    Если бот отправляет через общий планировщик, global_rate=None: темп задаёт
+    планировщик, а rate_limit_args (например, низкий приоритет) передаются ему
+    """
+
+    def __init__(self, global_rate=25, max_retries=3, rate_limit_args=None):
+        self.global_rate = global_rate
+        self.max_retries = max_retries
+        self.rate_limit_args = rate_limit_args
+
+        self._next_send = 0.0
+        self._lock = asyncio.Lock()
+
+        self.sent = 0
+        self.failed = 0
+
+    async def _throttle(self):
+        if self.global_rate is None:
+            return
+
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_send - now
+            self._next_send = max(now, self._next_send) + 1.0 / self.global_rate
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def send(self, bot, notifications):
+        """
+        Отправка списка (chat_id, текст)
+        """
+        by_chat = defaultdict(list)
+        for chat_id, text in notifications:
+            by_chat[chat_id].append(text)
+
+        for chat_id, texts in by_chat.items():
+            await self._send_one(bot, chat_id, "\n".join(texts))
+
+    async def _send_one(self, bot, chat_id, text):
+        for attempt in range(self.max_retries + 1):
+            await self._throttle()
+            try:
+                if self.rate_limit_args is not None:
+                    await bot.send_message(chat_id, text, parse_mode='HTML', rate_limit_args=self.rate_limit_args)
+                else:
+                    await bot.send_message(chat_id, text, parse_mode='HTML')
+                self.sent += 1
+                return
+
+            except RetryAfter as e:
+                print(f"Лимит Telegram, пауза {e.retry_after} с")
+                await asyncio.sleep(e.retry_after)
+
+            except Forbidden:
+                # Пользователь заблокировал бота - повторять бессмысленно
+                break
+
+            except TelegramError as e:
+                print(f"Ошибка отправки уведомления в {chat_id}: {e}")
+                break
+
+        self.failed += 1
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+
+# ========================================
+# ДОХОДНОСТЬ И РИСК ОБЛИГАЦИЙ
+# ========================================
+
+# Колонки, которые добавляет add_analytics_columns
+ANALYTICS_COLUMNS = ['ACCRUED_INT', 'DIRTY_PRICE', 'YTM', 'DURATION', 'MODIFIED_DURATION', 'CONVEXITY']
+
+DAYS_PER_YEAR = 365.0
+
+
+def coupon_schedule(days_to_next, days_to_maturity, period):
+    """
+    Сроки оставшихся купонов в годах для всех бумаг сразу.
+
+    Возвращает матрицу (бумаги x купоны) и маску действительных ячеек:
+    у каждой бумаги своё число купонов, лишние ячейки справа пустые
+    """
+    count = np.floor((days_to_maturity - days_to_next) / period).astype(np.int64) + 1
+    count = np.clip(count, 0, None)
+
+    width = int(count.max()) if count.size else 0
+    k = np.arange(width)
+
+    days = days_to_next[:, None] + k[None, :] * period[:, None]
+    mask = k[None, :] < count[:, None]
+
+    return days / DAYS_PER_YEAR, mask
+
+
+def solve_ytm(price, cash_flows, times, guess, iterations=50, tolerance=1e-10):
+    """
+    Векторный метод Ньютона: годовая эффективная доходность y, при которой
+    сумма CF / (1 + y) ** t равна цене - для всех бумаг одновременно
+    """
+    y = guess.copy()
+    active = np.isfinite(y)
+
+    for _ in range(iterations):
+        discount = (1.0 + y[:, None]) ** -times
+        value = (cash_flows * discount).sum(axis=1) - price
+        slope = -(cash_flows * times * discount).sum(axis=1) / (1.0 + y)
+
+        step = np.where(active, value / slope, 0.0)
+        y = np.clip(y - step, -0.99, None)
+
+        active &= np.abs(step) > tolerance
+        if not active.any():
+            break
+
+    return y
+
+
+def bond_analytics(df, today=None):
+    """
+    Доходность к погашению, дюрация, выпуклость и НКД для всех бумаг снимка.
+
+    Модель: купоны фиксированного размера COUPONVALUE каждые COUPONPERIOD дней,
+    начиная с NEXTCOUPON, и погашение номинала FACEVALUE в MATDATE.
+    Для бумаг без нужных данных результат - NaN
+    """
+    today = pd.Timestamp.now().normalize() if today is None else pd.Timestamp(today)
+
+    def days_until(column):
+        return (pd.to_datetime(df[column], errors='coerce') - today).dt.days.to_numpy(dtype=float)
+
+    face = pd.to_numeric(df['FACEVALUE'], errors='coerce').to_numpy(dtype=float)
+    coupon = pd.to_numeric(df['COUPONVALUE'], errors='coerce').to_numpy(dtype=float)
+    period = pd.to_numeric(df['COUPONPERIOD'], errors='coerce').to_numpy(dtype=float)
+    price_pct = pd.to_numeric(df['PRICE'], errors='coerce').to_numpy(dtype=float)
+
+    days_to_maturity = days_until('MATDATE')
+    days_to_next = days_until('NEXTCOUPON')
+
+    # Бескупонная бумага (COUPONPERIOD = 0) - один платёж номиналом в дату погашения.
+    # Купонную бумагу без размера купона или даты следующего купона не считаем:
+    # как бескупонная она получила бы заниженную доходность
+    no_coupons = period == 0
+    incomplete = ~no_coupons & (~(period > 0) | np.isnan(coupon) | np.isnan(days_to_next))
+
+    period = np.where(no_coupons | incomplete, 1.0, period)
+    days_to_next = np.where(no_coupons | incomplete, days_to_maturity, days_to_next)
+    coupon = np.where(no_coupons | incomplete, 0.0, coupon)
+
+    valid = (face > 0) & (price_pct > 0) & (days_to_maturity > 0) & (days_to_next >= 0) & ~incomplete
+
+    # Для невалидных строк подставляем безопасные значения, потом заменим на NaN
+    face = np.where(valid, face, 1.0)
+    price_pct = np.where(valid, price_pct, 100.0)
+    days_to_maturity = np.where(valid, days_to_maturity, DAYS_PER_YEAR)
+    days_to_next = np.where(valid, np.minimum(days_to_next, days_to_maturity), DAYS_PER_YEAR)
+
+    # НКД: доля текущего купонного периода, которая уже прошла
+    elapsed = np.clip(period - days_to_next, 0, None)
+    accrued = np.where(no_coupons, 0.0, coupon * elapsed / period)
+
+    dirty_price = price_pct / 100.0 * face + accrued
+
+    times, mask = coupon_schedule(days_to_next, days_to_maturity, period)
+    cash_flows = np.where(mask, coupon[:, None], 0.0)
+
+    # Номинал - отдельным столбцом в дату погашения
+    times = np.column_stack([np.where(mask, times, 0.0), days_to_maturity / DAYS_PER_YEAR])
+    cash_flows = np.column_stack([cash_flows, face])
+
+    guess = np.full(len(df), 0.1)
+    ytm = solve_ytm(dirty_price, cash_flows, times, guess)
+
+    discounted = cash_flows * (1.0 + ytm[:, None]) ** -times
+    pv = discounted.sum(axis=1)
+    duration = (times * discounted).sum(axis=1) / pv
+    convexity = (times * (times + 1.0) * discounted).sum(axis=1) / (pv * (1.0 + ytm) ** 2)
+
+    result = pd.DataFrame({
+        'ACCRUED_INT': accrued,
+        'DIRTY_PRICE': dirty_price,
+        'YTM': ytm * 100.0,
+        'DURATION': duration,
+        'MODIFIED_DURATION': duration / (1.0 + ytm),
+        'CONVEXITY': convexity,
+    }, index=df.index)
+
+    result.loc[~valid] = np.nan
+    return result
+
+
+def add_analytics_columns(df, today=None):
+    """
+    Добавление колонок доходности и риска к снимку доски
+    """
+    if df.empty:
+        return df
+
+    analytics = bond_analytics(df, today=today)
+    for column in ANALYTICS_COLUMNS:
+        df[column] = analytics[column]
+
+    return df
@@ -0,0 +1,366 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from snapshot import BoardSnapshot
+
+
+# ========================================
+# КЭШ СНИМКА ТОРГОВОЙ ДОСКИ
+# ========================================
+
+class BoardCache:
+    """
+    Общий для всего процесса кэш снимка торговой доски с временем жизни (TTL).
+
+    Если несколько обработчиков одновременно не нашли свежих данных,
+    они ждут одну общую загрузку, а не запускают каждый свою.
+
+    Если устаревший снимок уже есть, а загрузка не уложилась в stale_timeout
+    секунд или закончилась ошибкой, отдаётся устаревший снимок
+    (stale-while-revalidate): загрузка при этом продолжается в фоне.
+    """
+
+    def __init__(self, loader, ttl=60, keep_versions=3, stale_timeout=2.0):
+        # loader - корутинная функция без аргументов, возвращающая DataFrame
+        self.loader = loader
+        self.ttl = ttl
+        self.keep_versions = keep_versions
+        self.stale_timeout = stale_timeout
+
+        self._value = None
+        self._fetched_at = None
+        self._inflight = None
+
+        # Несколько последних снимков по версиям: на них ссылаются пользователи,
+        # открывшие список до обновления
+        self._version = 0
+        self._snapshots = OrderedDict()
+
+        # Подписчики на новый снимок: вызываются с BoardSnapshot после каждой успешной загрузки
+        self._listeners = []
+
+        # Счётчики для подбора TTL
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale = 0
+
+    def age(self):
+        """
+        Возраст закэшированного снимка в секундах (None, если снимка нет)
+        """
+        if self._fetched_at is None:
+            return None
+        return time.monotonic() - self._fetched_at
+
+    def is_fresh(self):
+        age = self.age()
+        return self._value is not None and age is not None and age < self.ttl
+
+    async def get(self):
+        """
+        Получение снимка: из кэша, если он свежий, иначе через общую загрузку.
+        Устаревший снимок, если загрузка не удалась или затянулась;
+        None, если загрузить доску не удалось и снимка нет совсем
+        """
+        if self.is_fresh():
+            self.hits += 1
+            return self._value
+
+        if self._inflight is None:
+            self.misses += 1
+            self._inflight = asyncio.ensure_future(self._refresh())
+        else:
+            # Загрузка уже идёт - просто присоединяемся к ней
+            self.coalesced += 1
+
+        task = self._inflight
+
+        # shield: отмена одного обработчика не должна отменять загрузку для остальных
+        if self._value is None:
+            return await asyncio.shield(task)
+
+        try:
+            snapshot = await asyncio.wait_for(asyncio.shield(task), timeout=self.stale_timeout)
+        except asyncio.TimeoutError:
+            snapshot = None
+
+        if snapshot is None:
+            self.stale += 1
+            return self._value
+        return snapshot
+
+    async def _refresh(self):
+        try:
+            df = await self.loader()
+            # Пустой результат означает ошибку загрузки - его не кэшируем
+            if df.empty:
+                return None
+
+            # Загрузчик может сообщить время получения данных (например, снимок из другого процесса)
+            snapshot = self._store(df, df.attrs.get('fetched_at', time.time()))
+
+            for listener in self._listeners:
+                listener(snapshot)
+            return snapshot
+        finally:
+            self._inflight = None
+
+    def _store(self, df, fetched_at):
+        self._version += 1
+        snapshot = BoardSnapshot(df, self._version, fetched_at=fetched_at)
+
+        self._value = snapshot
+        # Возраст по монотонным часам, с учётом того, когда снимок был получен с биржи
+        self._fetched_at = time.monotonic() - max(0.0, time.time() - fetched_at)
+
+        self._snapshots[snapshot.version] = snapshot
+        while len(self._snapshots) > self.keep_versions:
+            self._snapshots.popitem(last=False)
+
+        return snapshot
+
+    def restore(self, df, fetched_at):
+        """
+        Загрузка сохранённого ранее снимка (например, с диска при старте).
+        Свежим он считается только если моложе TTL
+        """
+        return self._store(df, fetched_at)
+
+    def latest(self):
+        """
+        Последний загруженный снимок, даже если он уже не свежий
+        """
+        return self._value
+
+    def snapshot(self, version):
+        """
+        Снимок по версии, если он ещё хранится (иначе None)
+        """
+        return self._snapshots.get(version)
+
+    def add_listener(self, listener):
+        """
+        Подписка на новые снимки: listener(snapshot) вызывается после каждой загрузки
+        """
+        self._listeners.append(listener)
+
+    def invalidate(self):
+        """
+        Сброс кэша: следующий запрос пойдёт на биржу
+        """
+        self._fetched_at = None
+
+    def stats(self):
+        """
+        Статистика кэша: попадания, промахи, возраст снимка
+        """
+        total = self.hits + self.misses + self.coalesced
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'stale': self.stale,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'age': self.age(),
+            'ttl': self.ttl,
+            'version': self._version,
+        }
+
+
+# ========================================
+# КЭШ СПРАВОЧНЫХ ДАННЫХ
+# ========================================
+
+class ReferenceCache:
+    """
+    Кэш редко меняющихся справочных данных (названия, объёмы, даты погашения)
+    с долгим временем жизни.
+
+    Если обновить справочник не удалось, продолжает отдавать прежние данные
+    и не повторяет загрузку раньше, чем через retry_after секунд.
+    """
+
+    def __init__(self, loader, ttl=6 * 3600, retry_after=300):
+        # loader - корутинная функция без аргументов, возвращающая DataFrame
+        # (или другой объект с len(), например календарь выплат)
+        self.loader = loader
+        self.ttl = ttl
+        self.retry_after = retry_after
+
+        self._value = None
+        self._fetched_at = None
+        # Время и результат последней неудачной загрузки
+        self._failed_at = None
+        self._failed_value = None
+        self._inflight = None
+        self._listeners = []
+
+        self.loads = 0
+        self.failures = 0
+
+    def age(self):
+        """
+        Возраст справочника в секундах (None, если он ещё не загружен)
+        """
+        if self._fetched_at is None:
+            return None
+        return time.monotonic() - self._fetched_at
+
+    def is_fresh(self):
+        age = self.age()
+        return self._value is not None and age is not None and age < self.ttl
+
+    async def get(self):
+        """
+        Справочник из кэша, если он свежий, иначе через общую загрузку
+        """
+        if self.is_fresh():
+            return self._value
+
+        # Пока биржа недоступна, тяжёлую загрузку не повторяем на каждый запрос
+        if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_after:
+            return self._value if self._value is not None else self._failed_value
+
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+
+        return await asyncio.shield(self._inflight)
+
+    async def _refresh(self):
+        try:
+            df = await self.loader()
+            if len(df) == 0:
+                self._failed_at = time.monotonic()
+                self._failed_value = df
+                self.failures += 1
+                # Устаревший справочник лучше, чем никакого
+                return self._value if self._value is not None else df
+
+            self._value = df
+            self._fetched_at = time.monotonic()
+            self._failed_at = None
+            self._failed_value = None
+            self.loads += 1
+
+            for listener in self._listeners:
+                listener(df)
+            return df
+        finally:
+            self._inflight = None
+
+    def latest(self):
+        """
+        Последний загруженный справочник (None, если его ещё нет)
+        """
+        return self._value
+
+    def add_listener(self, listener):
+        """
+        Подписка на обновления: listener(value) вызывается после каждой удачной загрузки
+        """
+        self._listeners.append(listener)
+
+    def invalidate(self):
+        """
+        Сброс кэша: следующий запрос перезагрузит справочник
+        """
+        self._fetched_at = None
+        self._failed_at = None
+
+
+# ========================================
+# КЭШ ДЕТАЛЕЙ ОБЛИГАЦИЙ
+# ========================================
+
+class DetailsCache:
+    """
+    Ограниченный по размеру LRU-кэш с временем жизни записей.
+
+    Ключ - SECID, значение - разобранный словарь деталей облигации.
+    Одновременные запросы одной и той же бумаги ждут одну загрузку.
+    """
+
+    def __init__(self, max_size=512, ttl=600):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        # SECID -> (время загрузки, детали); порядок = порядок использования
+        self._items = OrderedDict()
+        self._inflight = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Свежая запись из кэша или None
+        """
+        item = self._items.get(key)
+        if item is None:
+            return None
+
+        fetched_at, value = item
+        if time.monotonic() - fetched_at >= self.ttl:
+            del self._items[key]
+            return None
+
+        self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Сохранение записи с вытеснением самых давно использованных
+        """
+        self._items[key] = (time.monotonic(), value)
+        self._items.move_to_end(key)
+
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._items)
+
+    async def get_or_load(self, key, loader):
+        """
+        Детали из кэша или через loader(key); пустой результат не кэшируется
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader):
+        try:
+            value = await loader(key)
+            if value:
+                self.put(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self):
+        """
+        Статистика кэша деталей: попадания, промахи, заполненность
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'size': len(self._items),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+        }
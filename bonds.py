@@ -1,10 +1,31 @@
+import argparse
+import multiprocessing
 import os
-import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, InlineQueryHandler
 import asyncio
+import time
+
+from alerts import COUPON_SOON, YIELD_ABOVE, YIELD_BELOW, AlertBook, AlertSender
+from analytics import add_analytics_columns
+from board_cache import BoardCache, DetailsCache, ReferenceCache
+from charts import YIELD_HISTORY, YIELD_SCATTER, ChartService, render_yield_history, render_yield_scatter
+from coupon_calendar import PAYMENT_KINDS, CouponCalendar
+from curve import add_spread_column, curve_table, fit_ofz_curve
+from history import HistoryStore
+from issuers import IssuerClassifier, add_issuer_columns
+from moex_client import MoexClient
+from search import BondSearch
+from rate_limiter import SchedulerRateLimiter
+from send_scheduler import BULK, SendScheduler
+from session_store import SQLitePersistence
+from snapshot import BoardSnapshot, load_snapshot, save_snapshot
+from update_processor import ChatOrderedUpdateProcessor
+from webhook import run_webhook, stop_signal, webhook_secret
+from workers import SharedSnapshotReader, SharedSnapshotWriter, enable_copy_on_write, run_router, run_worker
 
 # ========================================
 # КОНФИГУРАЦИЯ
@@ -14,40 +35,277 @@ from config import TOKEN
 # Токен бота (получить у @BotFather)
 TOKEN = TOKEN
 
+# Режим получения обновлений: polling или webhook (можно переопределить ключом --mode)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+
+# Webhook: внешний адрес (https://host), адрес и порт встроенного сервера,
+# путь и секретный токен, который Telegram присылает с каждым обновлением
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or None
+
+# Параллельная обработка обновлений: сколько обновлений разных чатов
+# обрабатывать одновременно и сколько принятых обновлений держать в ожидании
+UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', '8'))
+UPDATE_MAX_PENDING = int(os.getenv('UPDATE_MAX_PENDING', '256'))
+
+# Несколько процессов: число воркеров бота (1 - всё в одном процессе),
+# каталог общего снимка доски и как часто воркеры проверяют его версию, секунд
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '1'))
+SHARED_BOARD_DIR = os.getenv('SHARED_BOARD_DIR', 'data/shared_board')
+SHARED_POLL_INTERVAL = float(os.getenv('SHARED_POLL_INTERVAL', '1'))
+
+# Адрес Bot API: для локальной проверки можно указать свой (поддельный) сервер
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+
+# Время жизни кэша торговой доски, секунд
+BOARD_CACHE_TTL = int(os.getenv('BOARD_CACHE_TTL', '60'))
+
+# Сколько секунд ждать обновления доски, прежде чем показать устаревший снимок
+BOARD_STALE_TIMEOUT = float(os.getenv('BOARD_STALE_TIMEOUT', '2'))
+
+# Файл с последним удачным снимком доски: с него бот стартует без обращения к бирже
+BOARD_SNAPSHOT_PATH = os.getenv('BOARD_SNAPSHOT_PATH', 'data/board_snapshot.feather')
+
+# Время жизни справочных данных по бумагам (названия, объёмы, даты), секунд
+REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', str(6 * 3600)))
+
+# Через сколько секунд повторять неудачную загрузку справочника или календаря
+REFERENCE_RETRY_AFTER = int(os.getenv('REFERENCE_RETRY_AFTER', '300'))
+
+# Календарь выплат: на сколько дней вперёд загружать графики и как часто их обновлять
+CALENDAR_HORIZON_DAYS = int(os.getenv('CALENDAR_HORIZON_DAYS', '365'))
+CALENDAR_CACHE_TTL = int(os.getenv('CALENDAR_CACHE_TTL', str(6 * 3600)))
+
+# Кэш деталей облигаций: сколько бумаг держать и сколько секунд
+DETAILS_CACHE_SIZE = int(os.getenv('DETAILS_CACHE_SIZE', '512'))
+DETAILS_CACHE_TTL = int(os.getenv('DETAILS_CACHE_TTL', '600'))
+
+# Сколько облигаций показывать на одной странице списка
+TOP_N = 10
+
+# Фоновый прогрев деталей топ-списка: не больше стольких загрузок одновременно
+PREFETCH_CONCURRENCY = int(os.getenv('PREFETCH_CONCURRENCY', '2'))
+
+# Режимы торгов облигациями: ОФЗ, корпоративные и т.д.
+BOND_BOARDS = [board.strip() for board in os.getenv('BOND_BOARDS', 'TQOB,TQCB').split(',') if board.strip()]
+
+# Сколько страниц одной доски загружать параллельно
+ISS_PAGE_WINDOW = int(os.getenv('ISS_PAGE_WINDOW', '4'))
+
+# Подписки на бумаги: файл хранения и за сколько дней напоминать о купоне
+ALERTS_PATH = os.getenv('ALERTS_PATH', 'data/alerts.npz')
+COUPON_ALERT_DAYS = int(os.getenv('COUPON_ALERT_DAYS', '3'))
+
+# Исходящие сообщения: сколько в секунду всем чатам вместе и одному чату,
+# сколько секунд придерживать правку-заглушку в ожидании окончательной
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', '25'))
+SEND_CHAT_RATE = float(os.getenv('SEND_CHAT_RATE', '1'))
+SEND_COALESCE_WINDOW = float(os.getenv('SEND_COALESCE_WINDOW', '0.5'))
+
+# История доходностей: каталог хранилища, глубина начальной загрузки в днях,
+# сколько дней догружать за один запуск задачи и как часто её запускать, секунд
+HISTORY_DIR = os.getenv('HISTORY_DIR', 'data/history')
+HISTORY_DEPTH_DAYS = int(os.getenv('HISTORY_DEPTH_DAYS', '365'))
+HISTORY_BACKFILL_DAYS = int(os.getenv('HISTORY_BACKFILL_DAYS', '25'))
+HISTORY_UPDATE_INTERVAL = int(os.getenv('HISTORY_UPDATE_INTERVAL', '900'))
+
+# Сессии пользователей: файл SQLite, как часто сбрасывать изменения, секунд,
+# и через сколько дней без активности сессия удаляется
+SESSIONS_PATH = os.getenv('SESSIONS_PATH', 'data/sessions.sqlite3')
+SESSION_FLUSH_INTERVAL = int(os.getenv('SESSION_FLUSH_INTERVAL', '30'))
+SESSION_IDLE_DAYS = int(os.getenv('SESSION_IDLE_DAYS', '30'))
+
+# Графики: сколько процессов рисуют PNG и сколько графиков держать в кэше
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', '2'))
+CHART_CACHE_SIZE = int(os.getenv('CHART_CACHE_SIZE', '256'))
+
+# Не больше стольких одновременных запросов к ISS
+ISS_MAX_CONCURRENCY = int(os.getenv('ISS_MAX_CONCURRENCY', '8'))
+
+# Общий клиент ISS: один пул соединений на весь процесс
+iss_client = MoexClient(max_concurrency=ISS_MAX_CONCURRENCY)
+
 
 # ========================================
 # ФУНКЦИИ РАБОТЫ С API МОСКОВСКОЙ БИРЖИ
 # ========================================
 
-def get_all_bonds():
+# Типы колонок снимка: числа приводятся один раз при загрузке
+SECURITIES_NUMERIC = ['ISSUESIZE', 'COUPONPERCENT', 'COUPONPERIOD', 'COUPONVALUE', 'FACEVALUE', 'PREVPRICE']
+MARKETDATA_NUMERIC = ['YIELDCLOSE', 'WAPRICE', 'LAST']
+
+
+def board_path(board):
+    return f"/engines/stock/markets/bonds/boards/{board}/securities.json"
+
+
+async def load_boards(block, columns, numeric):
+    """
+    Блок ISS со всех досок BOND_BOARDS одним DataFrame с индексом SECID.
+
+    Доски и страницы внутри доски загружаются параллельно
     """
-    Получение списка всех облигаций с Московской биржи
+    results = await asyncio.gather(*(
+        iss_client.get_block(
+            board_path(board),
+            block,
+            params={f'{block}.columns': columns},
+            endpoint='board',
+            window=ISS_PAGE_WINDOW,
+        )
+        for board in BOND_BOARDS
+    ))
+
+    frames = [pd.DataFrame(rows, columns=board_columns) for board_columns, rows in results]
+    df = pd.concat(frames, ignore_index=True)
+
+    for column in numeric:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+
+    # Бумага может встречаться на нескольких досках - берём первую по порядку BOND_BOARDS
+    return df.drop_duplicates('SECID').set_index('SECID')
+
+
+async def get_static_bonds():
+    """
+    Справочные данные по облигациям: меняются примерно раз в день
     """
-    url = "https://iss.moex.com/iss/engines/stock/markets/bonds/boards/TQOB/securities.json"
+    columns = ('SECID,BOARDID,SHORTNAME,SECNAME,ISSUESIZE,COUPONPERCENT,COUPONPERIOD,COUPONVALUE,'
+               'NEXTCOUPON,FACEVALUE,PREVPRICE,MATDATE,LISTLEVEL')
+
+    try:
+        df = await load_boards('securities', columns, SECURITIES_NUMERIC)
+        df['BOARDID'] = df['BOARDID'].astype('category')
 
+        # Категория эмитента и признаки для фильтрации считаются один раз
+        # на загрузку справочника
+        df = add_issuer_columns(df, issuer_classifier)
+        return add_feature_columns(df)
+
+    except Exception as e:
+        print(f"Ошибка получения справочных данных: {e}")
+        return pd.DataFrame()
+
+
+async def get_market_data():
+    """
+    Рыночные данные по облигациям: меняются в течение дня
+    """
+    return await load_boards('marketdata', 'SECID,YIELDCLOSE,WAPRICE,LAST', MARKETDATA_NUMERIC)
+
+
+async def get_coupon_calendar():
+    """
+    Графики купонов и погашений для всех бумаг справочника одним пакетом.
+
+    Вместо запроса на каждую бумагу читается общий постраничный список
+    выплат ISS за горизонт CALENDAR_HORIZON_DAYS
+    """
+    path = "/statistics/engines/stock/markets/bonds/bondization.json"
+
+    today = datetime.now().date()
     params = {
-        'securities.columns': 'SECID,SHORTNAME,SECNAME,ISSUESIZE,COUPONPERCENT,COUPONPERIOD,MATDATE,LISTLEVEL',
-        'marketdata.columns': 'YIELDCLOSE,COUPONVALUE'
+        'from': today.isoformat(),
+        'till': (today + timedelta(days=CALENDAR_HORIZON_DAYS)).isoformat(),
+        'coupons.columns': 'secid,coupondate,value_rub',
+        'amortizations.columns': 'secid,amortdate,value_rub',
     }
 
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        static, (coupon_columns, coupon_rows), (amort_columns, amort_rows) = await asyncio.gather(
+            reference_cache.get(),
+            iss_client.get_block(path, 'coupons', params=params, endpoint='board', window=ISS_PAGE_WINDOW),
+            iss_client.get_block(path, 'amortizations', params=params, endpoint='board', window=ISS_PAGE_WINDOW),
+        )
 
-        # Парсим данные
-        securities_columns = data['securities']['columns']
-        securities_data = data['securities']['data']
+        coupons = pd.DataFrame(coupon_rows, columns=coupon_columns).rename(columns={'coupondate': 'date'})
+        redemptions = pd.DataFrame(amort_rows, columns=amort_columns).rename(columns={'amortdate': 'date'})
+
+        # Только бумаги с наших досок
+        coupons = coupons[coupons['secid'].isin(static.index)]
+        redemptions = redemptions[redemptions['secid'].isin(static.index)]
 
-        marketdata_columns = data['marketdata']['columns']
-        marketdata_data = data['marketdata']['data']
+        return CouponCalendar.from_frames(coupons, redemptions)
+
+    except Exception as e:
+        print(f"Ошибка получения календаря выплат: {e}")
+        return CouponCalendar.empty()
 
-        # Создаем DataFrame
-        df_securities = pd.DataFrame(securities_data, columns=securities_columns)
-        df_marketdata = pd.DataFrame(marketdata_data, columns=marketdata_columns)
 
-        df = pd.concat([df_securities, df_marketdata], axis=1)
+async def get_history_day(day):
+    """
+    Итоги торгов за один день по всем доскам BOND_BOARDS: SECID, YIELDCLOSE, CLOSE.
+
+    Ошибки не перехватываются: день, который не удалось загрузить,
+    нельзя отмечать как обработанный
+    """
+    results = await asyncio.gather(*(
+        iss_client.get_block(
+            f"/history/engines/stock/markets/bonds/boards/{board}/securities.json",
+            'history',
+            params={'date': day.isoformat(), 'history.columns': 'SECID,YIELDCLOSE,CLOSE'},
+            endpoint='board',
+            window=ISS_PAGE_WINDOW,
+        )
+        for board in BOND_BOARDS
+    ))
 
+    frames = [pd.DataFrame(rows, columns=board_columns) for board_columns, rows in results]
+    df = pd.concat(frames, ignore_index=True)
+
+    return df.drop_duplicates('SECID')
+
+
+def get_bond_board(secid):
+    """
+    Режим торгов бумаги по текущему снимку доски или справочнику
+    (TQOB, если бумага неизвестна). В воркере справочник не загружается,
+    а в снимке колонка BOARDID есть всегда
+    """
+    snapshot = board_cache.latest()
+    if snapshot is not None:
+        pos = snapshot.position(secid)
+        if pos is not None:
+            return snapshot.df.at[pos, 'BOARDID']
+
+    static = reference_cache.latest()
+    if static is not None and secid in static.index:
+        return static.at[secid, 'BOARDID']
+    return 'TQOB'
+
+
+async def get_all_bonds():
+    """
+    Получение списка всех облигаций с Московской биржи.
+
+    Справочник берётся из кэша с долгим TTL, с биржи каждый раз
+    запрашиваются только рыночные данные
+    """
+    try:
+        static = await reference_cache.get()
+        if static.empty:
+            return pd.DataFrame()
+
+        market = await get_market_data()
+
+        # Объединение по SECID: порядок строк (по надёжности) берётся из справочника
+        df = static.join(market, how='left').reset_index()
+
+        # Цена в % от номинала: средневзвешенная, последняя сделка или цена прошлого дня
+        df['PRICE'] = df['WAPRICE'].fillna(df['LAST']).fillna(df['PREVPRICE'])
+
+        # Доходность, дюрация, НКД и колонки для отображения зависят от цены
+        # и текущей даты - считаем на каждый снимок
+        df = add_analytics_columns(df)
+
+        # Спред к кривой ОФЗ этого же снимка; подобранная кривая
+        # переходит в снимок, и /curve не подбирает её заново
+        curve = fit_ofz_curve(df)
+        df = add_display_columns(add_spread_column(df, curve))
+        df.attrs['memo'] = {'curve': curve}
         return df
 
     except Exception as e:
@@ -55,17 +313,20 @@ def get_all_bonds():
         return pd.DataFrame()
 
 
-def get_bond_details(secid):
+async def fetch_bond_details(secid):
     """
-    Получение детальной информации об облигации
+    Загрузка детальной информации об облигации с биржи
     """
-    # Основная информация
-    url = f"https://iss.moex.com/iss/securities/{secid}.json"
+    # Основная информация и купоны запрашиваются параллельно
+    path = f"/securities/{secid}.json"
+    board = get_bond_board(secid)
+    coupon_path = f"/statistics/engines/stock/markets/bonds/boards/{board}/securities/{secid}.json"
 
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data, coupon_data = await asyncio.gather(
+            iss_client.get_json(path, endpoint='security'),
+            iss_client.get_json(coupon_path, endpoint='statistics'),
+        )
 
         details = {}
 
@@ -75,10 +336,6 @@ def get_bond_details(secid):
                 details[item[0]] = item[1]
 
         # Дополнительные данные по купонам
-        coupon_url = f"https://iss.moex.com/iss/statistics/engines/stock/markets/bonds/boards/TQOB/securities/{secid}.json"
-        coupon_response = requests.get(coupon_url, timeout=10)
-        coupon_data = coupon_response.json()
-
         if 'coupons' in coupon_data:
             coupons = coupon_data['coupons']['data']
             if coupons:
@@ -92,43 +349,198 @@ def get_bond_details(secid):
         return {}
 
 
-def filter_reliable_bonds(df, top_n=10):
+async def get_bond_details(secid):
+    """
+    Получение детальной информации об облигации (через кэш деталей)
+    """
+    return await details_cache.get_or_load(secid, fetch_bond_details)
+
+
+# Объекты, которые читают и создают файлы в data/, создаются при запуске
+# процесса бота (init_services), а не при импорте: модуль импортируют и
+# процессы отрисовки графиков, которым они не нужны
+alert_book = None
+session_store = None
+history_store = None
+
+# Рассылка уведомлений по подпискам (с низким приоритетом)
+alert_sender = AlertSender(global_rate=None, rate_limit_args={'priority': BULK})
+
+# Все отправки бота идут через общий планировщик с лимитами Telegram
+send_scheduler = SendScheduler(
+    global_rate=SEND_GLOBAL_RATE,
+    chat_rate=SEND_CHAT_RATE,
+    coalesce_window=SEND_COALESCE_WINDOW,
+)
+
+# Графики рисуются в пуле процессов, отправленные - переиспользуются по file_id
+chart_service = ChartService(max_workers=CHART_WORKERS, max_size=CHART_CACHE_SIZE)
+
+# Категории эмитентов запоминаются по SECID между обновлениями справочника
+issuer_classifier = IssuerClassifier()
+
+# Справочник обновляется редко, рыночные данные - на каждый снимок доски
+reference_cache = ReferenceCache(get_static_bonds, ttl=REFERENCE_CACHE_TTL, retry_after=REFERENCE_RETRY_AFTER)
+
+# Поиск по SECID и названиям: индекс перестраивается при каждом обновлении справочника
+bond_search = BondSearch()
+reference_cache.add_listener(bond_search.rebuild)
+
+# Календарь выплат строится из графиков всех бумаг и обновляется так же редко
+calendar_cache = ReferenceCache(get_coupon_calendar, ttl=CALENDAR_CACHE_TTL, retry_after=REFERENCE_RETRY_AFTER)
+
+# Общий кэш доски: все пользователи получают один и тот же снимок,
+# пока он не старше BOARD_CACHE_TTL
+board_cache = BoardCache(get_all_bonds, ttl=BOARD_CACHE_TTL, stale_timeout=BOARD_STALE_TIMEOUT)
+
+# Разобранные детали облигаций по SECID: популярные бумаги открываются из памяти
+details_cache = DetailsCache(max_size=DETAILS_CACHE_SIZE, ttl=DETAILS_CACHE_TTL)
+
+# В воркере снимок доски не загружается с биржи, а читается из общего файла
+shared_board = None
+
+# Возраст снимка, после которого пользователю показывается пометка "данные на ...".
+# В воркере больше TTL: снимок приходит от процесса загрузки с задержкой
+board_stale_after = BOARD_CACHE_TTL
+
+# Обновления разных чатов - параллельно, одного чата - по порядку
+update_processor = ChatOrderedUpdateProcessor(max_workers=UPDATE_WORKERS, max_pending=UPDATE_MAX_PENDING)
+
+
+# Признаки оферты и амортизации в полном названии выпуска
+OFFER_PATTERN = 'оферта|оферты|оферте'
+AMORTIZATION_PATTERN = 'аморт|погаш'
+
+
+def add_feature_columns(df):
+    """
+    Расчёт признаков для фильтрации - один раз при загрузке снимка:
+    - HAS_OFFER, HAS_AMORTIZATION - флаги по названию выпуска
+    - LISTLEVEL - уровень листинга компактным целым
+    - MATDATE_DT - разобранная дата погашения
+
+    Строки возвращаются отсортированными по надёжности (упрощённо - по размеру
+    выпуска и доходности), поэтому фильтру достаточно взять первые N по маске
+    """
+    if df.empty:
+        return df
+
+    names = df['SECNAME'].str.lower()
+    df['HAS_OFFER'] = names.str.contains(OFFER_PATTERN, na=False).astype(bool)
+    df['HAS_AMORTIZATION'] = names.str.contains(AMORTIZATION_PATTERN, na=False).astype(bool)
+    df['LISTLEVEL'] = pd.to_numeric(df['LISTLEVEL'], errors='coerce').fillna(0).astype('int8')
+    df['MATDATE_DT'] = pd.to_datetime(df['MATDATE'], errors='coerce')
+
+    return df.sort_values(
+        by=['ISSUESIZE', 'COUPONPERCENT'],
+        ascending=[False, False],
+        kind='stable'
+    )
+
+
+def filter_reliable_bonds(df, top_n=10, list_level=1, min_issue_size=None, sort_by=None):
     """
     Фильтрация надёжных облигаций:
     - Без оферты
     - Без амортизации
-    - Сортировка по надёжности
+    - Заданный уровень листинга (по умолчанию 1-й)
+    - Объём выпуска не меньше min_issue_size (если задан)
+    - Сортировка по надёжности или по колонке sort_by (например, YTM или SPREAD) по убыванию
+
+    Индекс строк сохраняется: для снимка доски это номера строк в снимке.
+    top_n=None - все подходящие облигации
     """
     if df.empty:
         return df
 
-    # Копируем датафрейм
-    filtered = df.copy()
+    # Признаки обычно уже посчитаны при загрузке снимка
+    if 'HAS_OFFER' not in df.columns:
+        df = add_feature_columns(df.copy())
 
-    # Фильтр 1: Исключаем облигации с оферты (обычно содержат "оферта" в названии)
-    filtered = filtered[~filtered['SECNAME'].str.lower().str.contains('оферта|оферты|оферте', na=False)]
+    # Спред к кривой ОФЗ - колонка снимка, для других таблиц считаем на месте
+    if sort_by == 'SPREAD' and 'SPREAD' not in df.columns:
+        df = add_spread_column(df.copy(), fit_ofz_curve(df))
 
-    # Фильтр 2: Исключаем амортизируемые облигации
-    filtered = filtered[~filtered['SECNAME'].str.lower().str.contains('аморт|погаш', na=False)]
+    today = pd.Timestamp.now().normalize().to_datetime64()
 
-    # Фильтр 3: Только ликвидные облигации (1-й уровень листинга)
-    filtered = filtered[filtered['LISTLEVEL'] == 1]
+    mask = (
+        ~df['HAS_OFFER'].to_numpy()                          # Без оферты
+        & ~df['HAS_AMORTIZATION'].to_numpy()                 # Без амортизации
+        & (df['LISTLEVEL'].to_numpy() == list_level)         # Уровень листинга
+        & df['COUPONPERCENT'].notna().to_numpy()             # С купонной доходностью
+        & (df['MATDATE_DT'].to_numpy() > today)              # Срок погашения в будущем
+    )
 
-    # Фильтр 4: Только с купонной доходностью
-    filtered = filtered[filtered['COUPONPERCENT'].notna()]
+    if min_issue_size is not None:
+        mask &= df['ISSUESIZE'].to_numpy() >= min_issue_size
 
-    # Фильтр 5: Срок погашения в будущем
-    today = datetime.now().date()
-    filtered = filtered[pd.to_datetime(filtered['MATDATE']).dt.date > today]
+    if sort_by is not None:
+        selected = df.iloc[np.flatnonzero(mask)]
+        return selected.sort_values(sort_by, ascending=False, na_position='last', kind='stable').iloc[:top_n]
 
-    # Сортировка по надёжности (упрощённо - по размеру выпуска и доходности)
-    filtered = filtered.sort_values(
-        by=['ISSUESIZE', 'COUPONPERCENT'],
-        ascending=[False, False]
-    )
+    # Строки уже упорядочены по надёжности - берём первые N подходящих
+    return df.iloc[np.flatnonzero(mask)[:top_n]]
 
-    # Берём топ N
-    return filtered.head(top_n).reset_index(drop=True)
+
+def reliable_order(snapshot):
+    """
+    Номера строк всех надёжных облигаций снимка по убыванию надёжности.
+
+    Считается один раз на снимок: страницы списка - это срезы этого массива
+    """
+    order = snapshot.memo.get('reliable_order')
+    if order is None:
+        order = filter_reliable_bonds(snapshot.df, top_n=None).index.to_numpy()
+        snapshot.memo['reliable_order'] = order
+    return order
+
+
+def yield_curve(snapshot):
+    """
+    Кривая ОФЗ снимка (None, если ОФЗ для подбора слишком мало).
+
+    Подбирается один раз на версию снимка (обычно уже при загрузке доски)
+    """
+    if 'curve' not in snapshot.memo:
+        snapshot.memo['curve'] = fit_ofz_curve(snapshot.df)
+    return snapshot.memo['curve']
+
+
+def select_top_bonds(snapshot, top_n=TOP_N, offset=0):
+    """
+    Номера строк снимка для страницы списка надёжных облигаций
+    """
+    return tuple(int(pos) for pos in reliable_order(snapshot)[offset:offset + top_n])
+
+
+def get_user_bonds(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Снимок и смещение страницы списка, которую пользователь видел последней.
+
+    В user_data хранится только ссылка: версия снимка и смещение.
+    Если снимок уже вытеснен, страница берётся из свежего снимка
+    """
+    ref = context.user_data.get('bonds_ref')
+    if ref is None:
+        return None, 0
+
+    version, offset = ref
+    snapshot = board_cache.snapshot(version)
+    if snapshot is None:
+        snapshot = board_cache.latest()
+        if snapshot is None:
+            return None, 0
+
+    # Список может оказаться короче - как и при перелистывании, берём последнюю страницу.
+    # Смещение проверяем и для совпавшей версии: нумерация версий начинается заново
+    # после перезапуска, и восстановленная ссылка может указывать на другой снимок
+    total = len(reliable_order(snapshot))
+    clamped = max(min(offset, (total - 1) // TOP_N * TOP_N), 0)
+    if (snapshot.version, clamped) != (version, offset):
+        offset = clamped
+        context.user_data['bonds_ref'] = (snapshot.version, offset)
+
+    return snapshot, offset
 
 
 def calculate_coupon_frequency(coupon_period):
@@ -142,50 +554,95 @@ def calculate_coupon_frequency(coupon_period):
     return round(days_per_year / coupon_period, 1)
 
 
+def add_display_columns(df):
+    """
+    Векторный расчёт колонок для таблицы: дни и годы до погашения, рейтинг
+    """
+    if df.empty:
+        return df
+
+    if 'MATDATE_DT' in df.columns:
+        mat_dt = df['MATDATE_DT']
+    else:
+        mat_dt = pd.to_datetime(df['MATDATE'], errors='coerce')
+    days_to_maturity = (mat_dt - pd.Timestamp.now()).dt.days
+
+    df['DAYS_TO_MATURITY'] = days_to_maturity.astype('Int64')
+    df['YEARS_TO_MATURITY'] = (days_to_maturity // 365).astype('Int64')
+
+    # Рейтинг - та же категория эмитента, что и в карточке, без пояснения в скобках
+    if 'ISSUER_RATING' in df.columns:
+        ratings = pd.Series(df['ISSUER_RATING'], dtype=object)
+        df['RATING_LABEL'] = ratings.str.split(' (', n=1, regex=False).str[0].fillna("—")
+    else:
+        df['RATING_LABEL'] = "—"
+
+    return df
+
+
 # ========================================
 # ФУНКЦИИ ФОРМАТИРОВАНИЯ СООБЩЕНИЙ
 # ========================================
 
-def format_bonds_table(df):
+def format_bonds_table(df, start=1, total=None):
     """
-    Форматирование таблицы облигаций для вывода в Telegram
+    Форматирование таблицы облигаций для вывода в Telegram.
+
+    start - номер первой строки, total - сколько всего облигаций в списке
     """
     if df.empty:
         return "❌ Не удалось загрузить данные об облигациях."
 
-    message = "📋 <b>Топ 10 надёжных облигаций</b>\n\n"
-    message += "<i>Без оферты, без амортизации</i>\n\n"
-    message += "┌─────────────────────────────────────┐\n"
+    if 'RATING_LABEL' not in df.columns:
+        df = add_display_columns(df.copy())
 
-    for idx, row in df.iterrows():
-        ticker = row['SECID']
-        name = row['SHORTNAME'][:30]  # Обрезаем длинные названия
-        coupon = row['COUPONPERCENT']
-        matdate = row['MATDATE']
-        yield_close = row.get('YIELDCLOSE', 0)
+    if total is None:
+        title = "📋 <b>Топ 10 надёжных облигаций</b>\n\n"
+    else:
+        title = f"📋 <b>Надёжные облигации {start}-{start + len(df) - 1} из {total}</b>\n\n"
+
+    lines = [
+        title,
+        "<i>Без оферты, без амортизации</i>\n\n",
+        "┌─────────────────────────────────────┐\n",
+    ]
+
+    rows = zip(df['SECID'], df['SHORTNAME'].str[:30], df['RATING_LABEL'],
+               df['COUPONPERCENT'], df['YEARS_TO_MATURITY'])
 
-        # Форматируем срок погашения
-        mat_dt = pd.to_datetime(matdate)
-        days_to_maturity = (mat_dt - pd.Timestamp.now()).days
-        years = days_to_maturity // 365
+    for number, (ticker, name, rating, coupon, years) in enumerate(rows, start=start):
+        lines.append(f"<b>{number}. {ticker}</b>\n")
+        lines.append(f"   {name}\n")
+        lines.append(f"   {rating} | Доходность: {coupon:.2f}% | Погашение: {years}г\n")
+        lines.append("─────────────────────────────────────\n")
 
-        # Определяем рейтинг (упрощённо)
-        rating = "🔵 AAA" if years <= 3 else "🟢 AA" if years <= 5 else "🟡 A"
+    lines.append("└─────────────────────────────────────┘\n\n")
+    lines.append("Выберите облигацию для подробной информации:")
 
-        message += f"<b>{idx + 1}. {ticker}</b>\n"
-        message += f"   {name}\n"
-        message += f"   {rating} | Доходность: {coupon:.2f}% | Погашение: {years}г\n"
-        message += "─────────────────────────────────────\n"
+    return "".join(lines)
+
+
+def format_history(history):
+    """
+    Сводка по истории доходности: начало и конец периода, минимум и максимум
+    """
+    yields = history['yield'].dropna()
+    if yields.empty:
+        return ""
 
-    message += "└─────────────────────────────────────┘\n\n"
-    message += "Выберите облигацию для подробной информации:"
+    first_date = pd.Timestamp(history.loc[yields.index[0], 'date']).strftime('%d.%m.%Y')
+    change = yields.iloc[-1] - yields.iloc[0]
 
+    message = f"📉 <b>Доходность с {first_date}:</b> {yields.iloc[0]:.2f}% → {yields.iloc[-1]:.2f}% ({change:+.2f} п.п.)\n"
+    message += f"   • Минимум {yields.min():.2f}%, максимум {yields.max():.2f}%\n"
     return message
 
 
-def format_bond_details(secid, details, basic_info):
+def format_bond_details(secid, details, basic_info, history=None):
     """
-    Форматирование детальной информации об облигации
+    Форматирование детальной информации об облигации.
+
+    history - локальная история бумаги (DataFrame с колонками date, yield, price)
     """
     message = f"📊 <b>Детальная информация: {secid}</b>\n\n"
 
@@ -194,7 +651,12 @@ def format_bond_details(secid, details, basic_info):
         row = basic_info.iloc[0]
 
         message += f"📌 <b>Название:</b> {row.get('SHORTNAME', 'N/A')}\n"
-        message += f"🏢 <b>Эмитент:</b> {row.get('SECNAME', 'N/A')}\n\n"
+        message += f"🏢 <b>Эмитент:</b> {row.get('SECNAME', 'N/A')}\n"
+
+        issuer_rating = row.get('ISSUER_RATING')
+        if pd.notna(issuer_rating):
+            message += f"⭐ <b>Рейтинг эмитента:</b> {issuer_rating}\n"
+        message += "\n"
 
         # Купонная информация
         coupon_percent = row.get('COUPONPERCENT', 0)
@@ -205,12 +667,15 @@ def format_bond_details(secid, details, basic_info):
 
         message += f"💰 <b>Купонная доходность:</b> {coupon_percent:.2f}% годовых\n"
         message += f"💵 <b>Размер купона:</b> {coupon_value:.2f} ₽\n"
-        message += f"📅 <b>Периодичность:</b> {coupon_freq} раз/год ({int(coupon_period)} дней)\n"
+        if pd.notna(coupon_period):
+            message += f"📅 <b>Периодичность:</b> {coupon_freq} раз/год ({int(coupon_period)} дней)\n"
 
-        # Срок погашения
+        # Срок погашения: у бессрочных бумаг ISS присылает 0000-00-00
         matdate = row.get('MATDATE', '')
-        if matdate:
-            mat_dt = pd.to_datetime(matdate)
+        mat_dt = row.get('MATDATE_DT')
+        if mat_dt is None:
+            mat_dt = pd.to_datetime(matdate, errors='coerce')
+        if pd.notna(mat_dt):
             days_to_maturity = (mat_dt - pd.Timestamp.now()).days
             years = days_to_maturity // 365
             months = (days_to_maturity % 365) // 30
@@ -222,6 +687,25 @@ def format_bond_details(secid, details, basic_info):
         if yield_close:
             message += f"📈 <b>Текущая доходность:</b> {yield_close:.2f}%\n"
 
+        # Доходность к погашению и риск по расчёту бота
+        ytm = row.get('YTM')
+        if pd.notna(ytm):
+            message += f"🎯 <b>Доходность к погашению:</b> {ytm:.2f}% (цена {row['PRICE']:.2f}%)\n"
+            message += f"⚖️ <b>Дюрация:</b> {row['DURATION']:.2f} г (модиф. {row['MODIFIED_DURATION']:.2f})\n"
+            message += f"〰️ <b>Выпуклость:</b> {row['CONVEXITY']:.2f}\n"
+
+        spread = row.get('SPREAD')
+        if pd.notna(spread):
+            message += f"📐 <b>Спред к кривой ОФЗ:</b> {spread:+.0f} б.п.\n"
+
+        accrued = row.get('ACCRUED_INT')
+        if pd.notna(accrued):
+            message += f"🧾 <b>НКД:</b> {accrued:.2f} ₽\n"
+
+        # Динамика доходности за год - из локальной истории
+        if history is not None and not history.empty:
+            message += format_history(history)
+
         # Размер выпуска
         issue_size = row.get('ISSUESIZE', 0)
         if issue_size:
@@ -248,27 +732,126 @@ def format_bond_details(secid, details, basic_info):
     return message
 
 
-def create_keyboard(df):
+def create_keyboard(df, start=1, version=None, total=None):
     """
-    Создание клавиатуры с выбором облигаций
+    Создание клавиатуры с выбором облигаций.
+
+    Если переданы версия снимка и размер списка, добавляются кнопки
+    перелистывания: в callback_data - курсор page_<версия>_<смещение>
     """
-    keyboard = []
+    keyboard = [
+        [InlineKeyboardButton(f"{number}. {ticker} - {coupon:.1f}%", callback_data=f"bond_{ticker}")]
+        for number, (ticker, coupon) in enumerate(zip(df['SECID'], df['COUPONPERCENT']), start=start)
+    ]
+
+    # Перелистывание страниц
+    if version is not None and total is not None:
+        offset = start - 1
+        navigation = []
+        if offset > 0:
+            navigation.append(InlineKeyboardButton("◀️ Назад", callback_data=f"page_{version}_{max(offset - TOP_N, 0)}"))
+        if offset + TOP_N < total:
+            navigation.append(InlineKeyboardButton("Далее ▶️", callback_data=f"page_{version}_{offset + TOP_N}"))
+        if navigation:
+            keyboard.append(navigation)
+
+    # Кнопки "Обновить" и график топ-списка (рисуется только по запросу)
+    actions = [InlineKeyboardButton("🔄 Обновить данные", callback_data="refresh")]
+    if version is not None:
+        actions.append(InlineKeyboardButton("📊 График", callback_data=f"chart_{version}"))
+    keyboard.append(actions)
 
-    for idx, row in df.iterrows():
-        ticker = row['SECID']
-        button_text = f"{idx + 1}. {ticker} - {row['COUPONPERCENT']:.1f}%"
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"bond_{ticker}")])
+    return InlineKeyboardMarkup(keyboard)
 
-    # Кнопка "Обновить"
-    keyboard.append([InlineKeyboardButton("🔄 Обновить данные", callback_data="refresh")])
 
-    return InlineKeyboardMarkup(keyboard)
+def format_as_of(snapshot):
+    """
+    Пометка "данные на ..." для устаревшего снимка (пустая строка для свежего)
+    """
+    if time.time() - snapshot.fetched_at < board_stale_after:
+        return ""
+
+    as_of = datetime.fromtimestamp(snapshot.fetched_at).strftime('%d.%m.%Y %H:%M')
+    return f"🕒 <i>Данные на {as_of}: биржа сейчас не отвечает, показан последний снимок</i>\n\n"
+
+
+def render_bonds_list(snapshot, offset=0):
+    """
+    Текст таблицы и клавиатура для страницы списка облигаций снимка.
+
+    Результат кэшируется в самом снимке, поэтому повторный показ той же
+    страницы (обновление, "Назад к списку", перелистывание) не форматирует её заново
+    """
+    key = ('bonds_page', offset)
+    rendered = snapshot.memo.get(key)
+
+    if rendered is None:
+        total = len(reliable_order(snapshot))
+        df = snapshot.take(select_top_bonds(snapshot, offset=offset))
+        rendered = (
+            format_bonds_table(df, start=offset + 1, total=total),
+            create_keyboard(df, start=offset + 1, version=snapshot.version, total=total),
+        )
+        snapshot.memo[key] = rendered
+
+    return rendered
+
+
+async def send_scatter_chart(bot, chat_id, snapshot):
+    """
+    График "доходность - срок" для топ-списка снимка
+    """
+    df = snapshot.take(select_top_bonds(snapshot))
+    yields = df['YTM'].fillna(df['YIELDCLOSE'])
+
+    try:
+        await chart_service.send(
+            bot, chat_id, (YIELD_SCATTER, None, snapshot.version), render_yield_scatter,
+            df['YEARS_TO_MATURITY'].to_numpy(dtype=float), yields.to_numpy(dtype=float),
+            df['SECID'].tolist(), "Доходность и срок до погашения",
+        )
+    except Exception as e:
+        print(f"Ошибка отправки графика: {e}")
+
+
+async def send_history_chart(bot, chat_id, secid, history, version):
+    """
+    График доходности бумаги за год из локальной истории
+    """
+    history = history.dropna(subset=['yield'])
+    if len(history) < 2:
+        return
+
+    try:
+        await chart_service.send(
+            bot, chat_id, (YIELD_HISTORY, secid, version), render_yield_history,
+            history['date'].to_numpy(), history['yield'].to_numpy(dtype=float), f"{secid}: доходность за год",
+        )
+    except Exception as e:
+        print(f"Ошибка отправки графика: {e}")
 
 
 # ========================================
 # ОБРАБОТЧИКИ КОМАНД TELEGRAM
 # ========================================
 
+async def show_placeholder(context: ContextTypes.DEFAULT_TYPE, message, text):
+    """
+    Правка-заглушка на время загрузки: если окончательная правка придёт
+    быстро, планировщик отправки её не отправит вовсе.
+
+    Обработчик заглушку не ждёт. Один проход цикла событий нужен, чтобы
+    задача успела встать в очередь планировщика раньше окончательной правки
+    """
+    context.application.create_task(context.bot.edit_message_text(
+        text,
+        chat_id=message.chat_id,
+        message_id=message.message_id,
+        rate_limit_args={'placeholder': True},
+    ))
+    await asyncio.sleep(0)
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обработчик команды /start
@@ -282,6 +865,11 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • Показывать топ-10 надёжных облигаций
 • Отображать ключевые параметры: доходность, срок, рейтинг
 • Давать подробную информацию по каждой бумаге
+• Показывать календарь выплат: /calendar 01.11.2026 30.11.2026
+• Следить за бумагами: /watch SECID, /watch SECID &gt;12.5, /watchlist
+• Считать выплаты по портфелю на год вперёд: /portfolio SECID 10 SECID 5
+• Показывать кривую доходности ОФЗ: /curve
+• Искать бумагу по тикеру или названию: /find ОФЗ 26238 (или @бот запрос в любом чате)
 
 💼 <b>Критерии отбора:</b>
 ✓ Без оферты
@@ -301,26 +889,24 @@ async def show_bonds(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     message = await update.message.reply_text("⏳ Загружаю данные с Московской биржи...")
 
-    # Получаем данные
-    df = get_all_bonds()
+    # Получаем общий снимок доски
+    snapshot = await board_cache.get()
 
-    if df.empty:
+    if snapshot is None:
         await message.edit_text("❌ Ошибка загрузки данных. Попробуйте позже.")
         return
 
-    # Фильтруем
-    df_filtered = filter_reliable_bonds(df, top_n=10)
-
-    if df_filtered.empty:
+    # Фильтруем (один раз на снимок)
+    if len(reliable_order(snapshot)) == 0:
         await message.edit_text("❌ Не найдено подходящих облигаций.")
         return
 
-    # Сохраняем данные в контексте для последующего использования
-    context.user_data['bonds_data'] = df_filtered
+    # Сохраняем в контексте только ссылку на снимок: версию и смещение страницы
+    context.user_data['bonds_ref'] = (snapshot.version, 0)
 
-    # Формируем сообщение
-    table_message = format_bonds_table(df_filtered)
-    keyboard = create_keyboard(df_filtered)
+    # Формируем сообщение (или берём уже готовое для этого снимка)
+    table_message, keyboard = render_bonds_list(snapshot)
+    table_message = format_as_of(snapshot) + table_message
 
     # Отправляем сообщение
     await message.edit_text(table_message, parse_mode='HTML', reply_markup=keyboard)
@@ -337,19 +923,22 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if data == "refresh":
         # Обновляем данные
-        await query.message.edit_text("⏳ Обновляю данные...")
+        await show_placeholder(context, query.message, "⏳ Обновляю данные...")
+
+        snapshot = await board_cache.get()
 
-        df = get_all_bonds()
-        df_filtered = filter_reliable_bonds(df, top_n=10)
+        if snapshot is None:
+            await query.message.edit_text("❌ Ошибка загрузки данных. Попробуйте позже.")
+            return
 
-        if df_filtered.empty:
+        if len(reliable_order(snapshot)) == 0:
             await query.message.edit_text("❌ Не найдено подходящих облигаций.")
             return
 
-        context.user_data['bonds_data'] = df_filtered
+        context.user_data['bonds_ref'] = (snapshot.version, 0)
 
-        table_message = format_bonds_table(df_filtered)
-        keyboard = create_keyboard(df_filtered)
+        table_message, keyboard = render_bonds_list(snapshot)
+        table_message = format_as_of(snapshot) + table_message
 
         await query.message.edit_text(table_message, parse_mode='HTML', reply_markup=keyboard)
 
@@ -357,17 +946,22 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Показать детали облигации
         secid = data.replace("bond_", "")
 
-        await query.message.edit_text(f"⏳ Загружаю информацию о {secid}...")
+        await show_placeholder(context, query.message, f"⏳ Загружаю информацию о {secid}...")
 
         # Получаем детали
-        details = get_bond_details(secid)
+        details = await get_bond_details(secid)
+
+        # Базовая информация из снимка: поиск по SECID через хэш-индекс
+        snapshot, _ = get_user_bonds(context)
+        if snapshot is None:
+            snapshot = board_cache.latest()
+        basic_info = snapshot.lookup(secid) if snapshot is not None else pd.DataFrame()
 
-        # Базовая информация из сохранённых данных
-        df_filtered = context.user_data.get('bonds_data', pd.DataFrame())
-        basic_info = df_filtered[df_filtered['SECID'] == secid] if not df_filtered.empty else pd.DataFrame()
+        # История за год читается из локального хранилища
+        history = history_store.series(secid, start=datetime.now().date() - timedelta(days=365))
 
         # Формируем сообщение
-        details_message = format_bond_details(secid, details, basic_info)
+        details_message = format_bond_details(secid, details, basic_info, history)
 
         # Клавиатура с кнопкой "Назад"
         back_keyboard = InlineKeyboardMarkup([
@@ -377,39 +971,859 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         await query.message.edit_text(details_message, parse_mode='HTML', reply_markup=back_keyboard)
 
+        # График истории доходности - отдельным сообщением в фоне: следующее
+        # нажатие в этом чате не ждёт отрисовки
+        version = snapshot.version if snapshot is not None else None
+        context.application.create_task(
+            send_history_chart(context.bot, query.message.chat_id, secid, history, version), update=update,
+        )
+
+    elif data.startswith("chart_"):
+        # График "доходность - срок" для списка, который видит пользователь
+        snapshot = board_cache.snapshot(int(data.split("_")[1]))
+        if snapshot is None:
+            snapshot = board_cache.latest()
+        if snapshot is None:
+            return
+
+        context.application.create_task(
+            send_scatter_chart(context.bot, query.message.chat_id, snapshot), update=update,
+        )
+
     elif data == "back_to_list":
         # Вернуться к списку
-        df_filtered = context.user_data.get('bonds_data', pd.DataFrame())
+        snapshot, offset = get_user_bonds(context)
 
-        if df_filtered.empty:
+        if snapshot is None or len(reliable_order(snapshot)) == 0:
             await query.message.edit_text("❌ Данные не найдены. Используйте /bonds")
             return
 
-        table_message = format_bonds_table(df_filtered)
-        keyboard = create_keyboard(df_filtered)
+        table_message, keyboard = render_bonds_list(snapshot, offset)
+        table_message = format_as_of(snapshot) + table_message
 
         await query.message.edit_text(table_message, parse_mode='HTML', reply_markup=keyboard)
 
+    elif data.startswith("page_"):
+        # Перелистывание: страница берётся срезом из уже отфильтрованного снимка
+        _, version, offset = data.split("_")
+
+        snapshot = board_cache.snapshot(int(version))
+        if snapshot is None:
+            snapshot = board_cache.latest()
+        total = len(reliable_order(snapshot)) if snapshot is not None else 0
+
+        if total == 0:
+            await query.message.edit_text("❌ Данные не найдены. Используйте /bonds")
+            return
+
+        # Если снимок сменился и список стал короче - показываем последнюю страницу
+        offset = min(int(offset), (total - 1) // TOP_N * TOP_N)
+        context.user_data['bonds_ref'] = (snapshot.version, offset)
+
+        table_message, keyboard = render_bonds_list(snapshot, offset)
+        table_message = format_as_of(snapshot) + table_message
+
+        await query.message.edit_text(table_message, parse_mode='HTML', reply_markup=keyboard)
+
+
+def parse_date(text):
+    """
+    Дата из аргумента команды: ДД.ММ.ГГГГ или ГГГГ-ММ-ДД
+    """
+    for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(text)
+
+
+# Больше строк в одном сообщении календаря не показываем
+CALENDAR_MAX_ROWS = 40
+
+
+def format_calendar(payments, start, end, names):
+    """
+    Форматирование выплат за период
+    """
+    period = f"{start:%d.%m.%Y} - {end:%d.%m.%Y}"
+    if payments.empty:
+        return f"📅 <b>Выплаты {period}</b>\n\nВыплат в этот период нет."
+
+    message = f"📅 <b>Выплаты {period}</b>\n"
+    message += f"<i>Всего выплат: {len(payments)}</i>\n\n"
+
+    shown = payments.head(CALENDAR_MAX_ROWS)
+    for date, secid, amount, kind in zip(shown['date'], shown['secid'], shown['amount'], shown['kind']):
+        name = names.get(secid, secid)
+        amount = f"{amount:.2f} ₽" if pd.notna(amount) else "сумма не объявлена"
+        message += f"{pd.Timestamp(date):%d.%m} <b>{secid}</b> {name} - {PAYMENT_KINDS[kind]} {amount}\n"
+
+    if len(payments) > CALENDAR_MAX_ROWS:
+        message += f"\n... и ещё {len(payments) - CALENDAR_MAX_ROWS}. Сузьте период."
+
+    return message
+
+
+async def show_calendar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /calendar [с] [по] - какие облигации платят в период
+    """
+    today = datetime.now().date()
+
+    try:
+        start = parse_date(context.args[0]) if context.args else today
+        end = parse_date(context.args[1]) if len(context.args) > 1 else start + timedelta(days=30)
+    except ValueError:
+        await update.message.reply_text("Формат: /calendar 01.11.2026 30.11.2026")
+        return
+
+    calendar = await calendar_cache.get()
+    if len(calendar) == 0:
+        await update.message.reply_text("❌ Ошибка загрузки календаря выплат. Попробуйте позже.")
+        return
+
+    static = reference_cache.latest()
+    names = static['SHORTNAME'].to_dict() if static is not None else {}
+
+    message = format_calendar(calendar.between(start, end), start, end, names)
+    await update.message.reply_text(message, parse_mode='HTML')
+
+
+def parse_portfolio(args):
+    """
+    Портфель из аргументов команды: пары SECID количество
+    """
+    if not args or len(args) % 2:
+        raise ValueError(args)
+
+    holdings = {}
+    for secid, quantity in zip(args[::2], args[1::2]):
+        quantity = int(quantity)
+        if quantity <= 0:
+            raise ValueError(quantity)
+        holdings[secid.upper()] = holdings.get(secid.upper(), 0) + quantity
+
+    # Компактный и хэшируемый вид: отсортированные пары
+    return tuple(sorted(holdings.items()))
+
+
+def format_portfolio(holdings, flows, unknown):
+    """
+    Форматирование помесячных выплат по портфелю
+    """
+    message = "💼 <b>Выплаты по портфелю на год вперёд</b>\n"
+    message += "<i>" + ", ".join(f"{secid} x{quantity}" for secid, quantity in holdings) + "</i>\n\n"
+
+    if flows.empty:
+        message += "Выплат в ближайший год нет.\n"
+    else:
+        for month, coupons, redemptions in zip(flows.index, flows['coupons'], flows['redemptions']):
+            message += f"{pd.Timestamp(month):%m.%Y}: купоны {coupons:,.2f} ₽"
+            if redemptions:
+                message += f", погашения {redemptions:,.2f} ₽"
+            message += "\n"
+
+        message += f"\n<b>Итого:</b> купоны {flows['coupons'].sum():,.2f} ₽, "
+        message += f"погашения {flows['redemptions'].sum():,.2f} ₽\n"
+
+    if unknown:
+        message += f"\n⚠️ Не найдены на бирже: {', '.join(unknown)}"
+
+    return message
+
+
+async def show_portfolio(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /portfolio [SECID количество ...] - прогноз выплат
+    """
+    try:
+        holdings = parse_portfolio(context.args) if context.args else context.user_data.get('portfolio')
+    except ValueError:
+        holdings = None
+
+    if not holdings:
+        await update.message.reply_text("Формат: /portfolio SU26238RMFS4 10 RU000A0JXFM1 5")
+        return
+
+    # Портфель запоминается, чтобы повторный /portfolio работал без аргументов
+    context.user_data['portfolio'] = holdings
+
+    snapshot = await board_cache.get()
+    calendar = await calendar_cache.get()
+    if snapshot is None or len(calendar) == 0:
+        await update.message.reply_text("❌ Ошибка загрузки данных. Попробуйте позже.")
+        return
+
+    # Результат зависит от портфеля, снимка и загрузки календаря - кэшируем в снимке
+    # с номером загрузки календаря в ключе, чтобы обновлённый календарь не остался незамеченным
+    key = ('portfolio', holdings, calendar_cache.loads)
+    message = snapshot.memo.get(key)
+
+    if message is None:
+        known = [(secid, quantity) for secid, quantity in holdings if secid in snapshot]
+        unknown = [secid for secid, quantity in holdings if secid not in snapshot]
+
+        quantities = pd.Series(dict(known), dtype=float)
+        coupon_values = snapshot.take([snapshot.position(secid) for secid in quantities.index])
+        coupon_values = pd.Series(coupon_values['COUPONVALUE'].to_numpy(), index=quantities.index)
+
+        today = datetime.now().date()
+        flows = calendar.project(quantities, today, today + timedelta(days=365), fallback_amounts=coupon_values)
+
+        message = format_portfolio(holdings, flows, unknown)
+        snapshot.memo[key] = message
+
+    await update.message.reply_text(message, parse_mode='HTML')
+
+
+# Названия видов подписок для списка /watchlist
+ALERT_KINDS = {
+    YIELD_ABOVE: "доходность выше {:.2f}%",
+    YIELD_BELOW: "доходность ниже {:.2f}%",
+    COUPON_SOON: "напоминание о купоне",
+}
+
+
+def parse_alert(args):
+    """
+    Вид подписки и порог из аргументов /watch: ничего, ">12.5", "<10" или "> 12.5"
+    """
+    spec = "".join(args)
+    if not spec:
+        return COUPON_SOON, float('nan')
+
+    kinds = {'>': YIELD_ABOVE, '<': YIELD_BELOW}
+    if spec[0] not in kinds:
+        raise ValueError(spec)
+
+    return kinds[spec[0]], float(spec[1:].replace(',', '.'))
+
+
+async def watch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /watch SECID [>порог|<порог] - подписка на бумагу
+    """
+    try:
+        secid = context.args[0].upper()
+        kind, threshold = parse_alert(context.args[1:])
+    except (IndexError, ValueError):
+        await update.message.reply_text(
+            "Формат: /watch SECID - напоминать о купоне\n"
+            "/watch SECID >12.5 или /watch SECID <10 - порог доходности, %"
+        )
+        return
+
+    snapshot = await board_cache.get()
+    if snapshot is not None and secid not in snapshot:
+        await update.message.reply_text(f"❌ Облигация {secid} не найдена.")
+        return
+
+    alert_book.add(update.effective_chat.id, secid, kind, threshold)
+    await update.message.reply_text(f"🔔 Подписка на {secid}: {ALERT_KINDS[kind].format(threshold)}")
+
+
+async def unwatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /unwatch [SECID] - отписка от бумаги или от всех
+    """
+    secid = context.args[0].upper() if context.args else None
+    removed = alert_book.remove(update.effective_chat.id, secid)
+    await update.message.reply_text(f"🔕 Удалено подписок: {removed}")
+
+
+async def show_watchlist(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /watchlist - подписки пользователя
+    """
+    subscriptions = alert_book.for_chat(update.effective_chat.id)
+    if not subscriptions:
+        await update.message.reply_text("Подписок нет. Добавьте: /watch SECID")
+        return
+
+    message = "🔔 <b>Ваши подписки</b>\n\n"
+    for secid, kind, threshold in subscriptions:
+        message += f"<b>{secid}</b>: {ALERT_KINDS[kind].format(threshold)}\n"
+
+    await update.message.reply_text(message, parse_mode='HTML')
+
+
+def format_curve(curve, snapshot):
+    """
+    Параметры кривой ОФЗ и её доходности на стандартных сроках
+    """
+    message = format_as_of(snapshot)
+    message += f"📐 <b>Кривая доходности ОФЗ</b> ({curve.model})\n\n"
+
+    for tenor, value in curve_table(curve).itertuples(index=False):
+        message += f"<code>{tenor:>4g} г</code>  {value:.2f}%\n"
+
+    betas = ", ".join(f"{beta:.2f}" for beta in curve.betas)
+    taus = ", ".join(f"{tau:.2f}" for tau in curve.taus)
+    message += f"\nβ: {betas}; τ: {taus}\n"
+    message += f"Бумаг в подборе: {curve.count}, среднеквадратичная ошибка {curve.rmse * 100:.0f} б.п.\n"
+    message += f"Сроки подбора: {curve.min_term:.1f}-{curve.max_term:.1f} г, за их пределами кривая не показывается\n"
+    message += "\n<i>Срок - дюрация бумаги; спред каждой облигации к кривой есть в её карточке</i>"
+
+    return message
+
+
+async def show_curve(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /curve - кривая доходности ОФЗ по текущему снимку
+    """
+    snapshot = await board_cache.get()
+    if snapshot is None:
+        await update.message.reply_text("❌ Ошибка загрузки данных. Попробуйте позже.")
+        return
+
+    curve = yield_curve(snapshot)
+    if curve is None:
+        await update.message.reply_text("❌ Недостаточно ОФЗ с ценами, чтобы построить кривую.")
+        return
+
+    await update.message.reply_text(format_curve(curve, snapshot), parse_mode='HTML')
+
+
+# Сколько бумаг показывать в результатах поиска
+SEARCH_LIMIT = 10
+
+
+async def find_bonds(query):
+    """
+    Поиск по индексу в памяти. Справочник загружается, только если
+    индекс ещё пуст (сразу после запуска)
+    """
+    if not len(bond_search):
+        await reference_cache.get()
+    return bond_search.search(query, limit=SEARCH_LIMIT)
+
+
+async def find(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /find запрос - поиск облигации по SECID или названию
+    """
+    query = " ".join(context.args)
+    if not query:
+        await update.message.reply_text("Формат: /find ОФЗ 26238 или /find SU26238")
+        return
+
+    found = await find_bonds(query)
+    if not found:
+        await update.message.reply_text(f"🔍 По запросу «{query}» ничего не найдено.")
+        return
+
+    keyboard = InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"{secid} - {shortname}", callback_data=f"bond_{secid}")]
+        for secid, shortname, _ in found
+    ])
+    await update.message.reply_text(f"🔍 Найдено по запросу «{query}»:", reply_markup=keyboard)
+
+
+async def inline_find(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Ответ на inline-запрос (@бот запрос): найденные бумаги с карточкой
+    по последнему снимку доски, без обращения к бирже.
+    Inline-режим нужно включить у @BotFather (/setinline)
+    """
+    query = update.inline_query.query
+    found = await find_bonds(query) if query.strip() else []
+
+    snapshot = board_cache.latest()
+    results = []
+    for secid, shortname, secname in found:
+        basic_info = snapshot.lookup(secid) if snapshot is not None else pd.DataFrame()
+        # Одна бумага с необычными данными не должна ломать весь ответ
+        try:
+            details = format_bond_details(secid, {}, basic_info)
+        except Exception as e:
+            print(f"Ошибка карточки {secid}: {e}")
+            continue
+
+        results.append(InlineQueryResultArticle(
+            id=secid,
+            title=f"{secid} - {shortname}",
+            description=secname,
+            input_message_content=InputTextMessageContent(details, parse_mode='HTML'),
+        ))
+
+    await update.inline_query.answer(results, cache_time=60)
+
+
+async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Обработчик команды /stats - статистика кэша доски
+    """
+    stats = board_cache.stats()
+    age = f"{stats['age']:.0f} с" if stats['age'] is not None else "нет данных"
+
+    message = "📈 <b>Кэш торговой доски</b>\n\n"
+    message += f"Попадания: {stats['hits']}\n"
+    message += f"Промахи: {stats['misses']}\n"
+    message += f"Ожидали общую загрузку: {stats['coalesced']}\n"
+    message += f"Доля попаданий: {stats['hit_ratio']:.0%}\n"
+    message += f"Возраст снимка: {age} (TTL {stats['ttl']} с)\n"
+    message += f"Версия снимка: {stats['version']}\n"
+    message += f"Отдан устаревший снимок: {stats['stale']}\n"
+
+    reference_age = reference_cache.age()
+    reference_age = f"{reference_age / 60:.0f} мин" if reference_age is not None else "нет данных"
+    message += f"Возраст справочника: {reference_age} (загрузок: {reference_cache.loads})\n"
+
+    details = details_cache.stats()
+    message += "\n📋 <b>Кэш деталей облигаций</b>\n\n"
+    message += f"Попадания: {details['hits']}\n"
+    message += f"Промахи: {details['misses']}\n"
+    message += f"Доля попаданий: {details['hit_ratio']:.0%}\n"
+    message += f"Бумаг в кэше: {details['size']} из {details['max_size']} (TTL {details['ttl']} с)\n"
+
+    message += "\n🔔 <b>Подписки</b>\n\n"
+    message += f"Всего подписок: {len(alert_book)}\n"
+    message += f"Отправлено уведомлений: {alert_sender.sent}, не доставлено: {alert_sender.failed}\n"
+
+    sends = send_scheduler.stats()
+    message += "\n📤 <b>Исходящие сообщения</b>\n\n"
+    message += f"Отправлено: {sends['sent']}, в очереди: {sends['queued']}\n"
+    message += f"Повторов после 429: {sends['retried']}, заглушек не понадобилось: {sends['coalesced']}\n"
+
+    updates = update_processor.stats()
+    message += "\n⚙️ <b>Обработка обновлений</b>\n\n"
+    message += f"Воркеров: {updates['workers']}, занято: {updates['running']}\n"
+    message += f"Ждут своей очереди: {updates['waiting']} (чатов: {updates['chats']})\n"
+    message += f"Очередь приложения: {context.application.update_queue.qsize()}\n"
+    message += f"Обработано: {updates['processed']}\n"
+    message += (f"Ожидание: среднее {updates['avg_wait'] * 1000:.0f} мс, "
+                f"95% {updates['p95_wait'] * 1000:.0f} мс, макс. {updates['max_wait'] * 1000:.0f} мс\n")
+
+    message += "\n🔍 <b>Поиск</b>\n\n"
+    message += f"Бумаг в индексе: {len(bond_search)}, перестроений: {bond_search.builds}\n"
+
+    charts = chart_service.stats()
+    message += "\n🖼 <b>Графики</b>\n\n"
+    message += f"Нарисовано: {charts['renders']}, загружено в Telegram: {charts['uploads']}\n"
+    message += f"Повторно отправлено по file_id: {charts['reused']}\n"
+
+    checked_until = history_store.checked_until
+    checked_until = f"{checked_until:%d.%m.%Y}" if checked_until is not None else "не загружалась"
+    message += "\n📉 <b>История доходностей</b>\n\n"
+    message += f"Записей: {len(history_store)}, загружена по {checked_until}\n"
+
+    message += "\n👤 <b>Сессии</b>\n\n"
+    message += f"Активных в памяти: {len(context.application.user_data)}\n"
+    message += (f"Записано: {session_store.writes} за {session_store.batches} транзакций, "
+                f"удалено неактивных: {session_store.evicted}\n")
+
+    await update.message.reply_text(message, parse_mode='HTML')
+
+
+# ========================================
+# ФОНОВЫЕ ЗАДАЧИ
+# ========================================
+
+async def prefetch_details_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Прогрев кэша деталей для облигаций из текущего топ-списка
+    """
+    secids = [secid for secid in context.job.data if secid not in details_cache]
+    semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+    async def prefetch(secid):
+        async with semaphore:
+            await get_bond_details(secid)
+
+    await asyncio.gather(*(prefetch(secid) for secid in secids))
+
+
+async def refresh_board_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Периодическое обновление доски, пока есть подписки: уведомления
+    должны приходить, даже если списком никто не пользуется
+    """
+    if len(alert_book):
+        await board_cache.get()
+
+
+async def alerts_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Проверка всех подписок по новому снимку и рассылка уведомлений
+    """
+    notifications = alert_book.evaluate(context.job.data, coupon_days=COUPON_ALERT_DAYS)
+    if notifications:
+        await alert_sender.send(context.bot, notifications)
+
+
+async def history_job(context: ContextTypes.DEFAULT_TYPE):
+    await update_history()
+
+
+async def update_history():
+    """
+    Догрузка истории: сначала глубина HISTORY_DEPTH_DAYS по частям,
+    затем по одному новому дню. Каждый день дописывается в конец хранилища
+    """
+    days = history_store.missing_days(datetime.now().date(), depth=HISTORY_DEPTH_DAYS)
+    loop = asyncio.get_running_loop()
+
+    for day in days[:HISTORY_BACKFILL_DAYS]:
+        try:
+            df = await get_history_day(day)
+        except Exception as e:
+            print(f"Ошибка загрузки истории за {day:%d.%m.%Y}: {e}")
+            return
+
+        await loop.run_in_executor(None, history_store.append_day, day, df)
+
+
+async def load_shared_board():
+    """
+    Загрузчик доски в воркере: новая версия общего снимка или пустой
+    DataFrame, если она не менялась (тогда остаётся прежний снимок)
+    """
+    loaded = shared_board.read()
+    if loaded is None:
+        return pd.DataFrame()
+
+    df, fetched_at = loaded
+    df.attrs['fetched_at'] = fetched_at
+    return df
+
+
+async def sync_shared_board_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Переход воркера на новую версию общего снимка и дописанную историю
+    """
+    if shared_board.changed():
+        board_cache.invalidate()
+        await board_cache.get()
+    history_store.refresh()
+
+
+async def evict_sessions_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Удаление давно неактивных сессий из базы и из памяти приложения
+    """
+    try:
+        user_ids = await session_store.evict_idle()
+    except Exception as e:
+        print(f"Ошибка очистки сессий: {e}")
+        return
+
+    for user_id in user_ids:
+        context.application.drop_user_data(user_id)
+
+
+def schedule_details_prefetch(application: Application, snapshot):
+    """
+    Постановка прогрева деталей в JobQueue для нового снимка доски
+    """
+    if application.job_queue is None:
+        return
+
+    secids = snapshot.take(select_top_bonds(snapshot))['SECID'].tolist()
+    if secids:
+        application.job_queue.run_once(prefetch_details_job, when=0, data=secids, name='prefetch_details')
+
+
+def schedule_alerts(application: Application, snapshot):
+    """
+    Постановка проверки подписок в JobQueue для нового снимка доски
+    """
+    if len(alert_book):
+        application.job_queue.run_once(alerts_job, when=0, data=snapshot, name='alerts')
+
 
 # ========================================
 # ГЛАВНАЯ ФУНКЦИЯ ЗАПУСКА
 # ========================================
 
-def main():
+def persist_snapshot(snapshot):
     """
-    Основная функция запуска бота
+    Сохранение нового снимка на диск в пуле потоков, не блокируя event loop
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, save_snapshot, snapshot, BOARD_SNAPSHOT_PATH)
+    future.add_done_callback(report_persist_error)
+
+
+def report_persist_error(future):
+    if future.exception() is not None:
+        print(f"Ошибка сохранения снимка: {future.exception()}")
+
+
+async def post_init(application: Application):
+    """
+    Восстановление снимка с диска и подписка на новые снимки доски:
+    сохранение на диск, фоновый прогрев деталей, проверка подписок
+    и догрузка истории доходностей
+    """
+    if shared_board is not None:
+        return await post_init_worker(application)
+
+    saved = load_snapshot(BOARD_SNAPSHOT_PATH)
+    if saved is not None:
+        df, fetched_at = saved
+        board_cache.restore(df, fetched_at)
+        # Поиск работает сразу, до первой загрузки справочника
+        bond_search.rebuild(df)
+        print(f"📂 Загружен снимок доски от {datetime.fromtimestamp(fetched_at):%d.%m.%Y %H:%M}")
+
+    board_cache.add_listener(persist_snapshot)
+
+    if application.job_queue is None:
+        print("⚠️ JobQueue недоступен, прогрев деталей, уведомления и история отключены (нужен python-telegram-bot[job-queue])")
+        return
+
+    board_cache.add_listener(lambda snapshot: schedule_details_prefetch(application, snapshot))
+    board_cache.add_listener(lambda snapshot: schedule_alerts(application, snapshot))
+    application.job_queue.run_repeating(refresh_board_job, interval=BOARD_CACHE_TTL, name='refresh_board')
+    application.job_queue.run_repeating(history_job, interval=HISTORY_UPDATE_INTERVAL, first=0, name='history')
+    application.job_queue.run_repeating(evict_sessions_job, interval=3600, name='evict_sessions')
+
+
+async def post_init_worker(application: Application):
+    """
+    Воркер: снимок доски и история приходят от процесса загрузки,
+    здесь только проверяются подписки и обновляется поиск
+    """
+    board_cache.add_listener(lambda snapshot: bond_search.rebuild(snapshot.df))
+    board_cache.add_listener(lambda snapshot: schedule_details_prefetch(application, snapshot))
+    board_cache.add_listener(lambda snapshot: schedule_alerts(application, snapshot))
+
+    application.job_queue.run_repeating(sync_shared_board_job, interval=SHARED_POLL_INTERVAL, first=0,
+                                        name='sync_shared_board')
+    application.job_queue.run_repeating(evict_sessions_job, interval=3600, name='evict_sessions')
+
+
+async def post_shutdown(application: Application):
+    """
+    Закрытие пула соединений с биржей и пула отрисовки графиков при остановке бота,
+    дожидаемся записи подписок на диск
+    """
+    await iss_client.close()
+    chart_service.close()
+    if alert_book is not None:
+        alert_book.flush()
+
+
+def parse_args():
+    """
+    Ключи командной строки: режим получения обновлений и параметры webhook
     """
-    # Создаём приложение
-    application = Application.builder().token(TOKEN).build()
+    parser = argparse.ArgumentParser(description="Бот надёжных облигаций")
+    parser.add_argument('--mode', choices=['polling', 'webhook'], default=BOT_MODE)
+    parser.add_argument('--webhook-url', default=WEBHOOK_URL)
+    parser.add_argument('--listen', default=WEBHOOK_LISTEN)
+    parser.add_argument('--port', type=int, default=WEBHOOK_PORT)
+    parser.add_argument('--workers', type=int, default=BOT_WORKERS)
+    return parser.parse_args()
+
+
+def build_application():
+    """
+    Приложение со всеми обработчиками
+    """
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(f"{TELEGRAM_API_URL}/bot")
+        .base_file_url(f"{TELEGRAM_API_URL}/file/bot")
+        .concurrent_updates(update_processor)
+        .rate_limiter(SchedulerRateLimiter(send_scheduler))
+        .persistence(session_store)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Регистрируем обработчики
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("bonds", show_bonds))
+    application.add_handler(CommandHandler("calendar", show_calendar))
+    application.add_handler(CommandHandler("watch", watch))
+    application.add_handler(CommandHandler("unwatch", unwatch))
+    application.add_handler(CommandHandler("watchlist", show_watchlist))
+    application.add_handler(CommandHandler("portfolio", show_portfolio))
+    application.add_handler(CommandHandler("curve", show_curve))
+    application.add_handler(CommandHandler("find", find))
+    application.add_handler(InlineQueryHandler(inline_find))
+    application.add_handler(CommandHandler("stats", show_stats))
     application.add_handler(CallbackQueryHandler(button_callback))
+    return application
+
+
+# ========================================
+# ЗАПУСК В НЕСКОЛЬКО ПРОЦЕССОВ
+# ========================================
+
+async def run_fetcher():
+    """
+    Процесс загрузки: каждые BOARD_CACHE_TTL секунд (от начала прошлой
+    загрузки) загружает доску и публикует снимок для воркеров.
+    История доходностей догружается отдельной задачей и не задерживает доску
+    """
+    writer = SharedSnapshotWriter(SHARED_BOARD_DIR)
+    stop = stop_signal()
+    loop = asyncio.get_running_loop()
+
+    async def wait_stop(timeout):
+        try:
+            await asyncio.wait_for(stop.wait(), max(0.0, timeout))
+        except asyncio.TimeoutError:
+            pass
+
+    async def history_loop():
+        while not stop.is_set():
+            try:
+                await update_history()
+            except Exception as e:
+                print(f"Ошибка обновления истории: {e}")
+            await wait_stop(HISTORY_UPDATE_INTERVAL)
+
+    history_task = asyncio.create_task(history_loop())
+
+    try:
+        while not stop.is_set():
+            started = loop.time()
+
+            df = await get_all_bonds()
+            if not df.empty:
+                fetched_at = time.time()
+                await loop.run_in_executor(None, writer.publish, df, fetched_at)
+                # Снимок на диске нужен и для запуска в одном процессе; запись - в фоне
+                persist_snapshot(BoardSnapshot(df, writer.version, fetched_at=fetched_at))
+
+            await wait_stop(BOARD_CACHE_TTL - (loop.time() - started))
+    finally:
+        history_task.cancel()
+        await asyncio.gather(history_task, return_exceptions=True)
+        await iss_client.close()
+
+
+def init_services(worker=None):
+    """
+    Подписки, сессии и история доходностей для процесса бота.
+    worker=(номер, всего) - воркер: свой файл подписок и своя доля сессий
+    """
+    global alert_book, session_store, history_store
+
+    alerts_path = ALERTS_PATH
+    if worker is not None:
+        root, ext = os.path.splitext(ALERTS_PATH)
+        alerts_path = f"{root}-{worker[0]}{ext}"
+
+    # Подписки пользователей
+    alert_book = AlertBook(alerts_path)
+
+    # Сессии пользователей (ссылки на страницу списка, портфель) переживают перезапуск
+    session_store = SQLitePersistence(
+        SESSIONS_PATH,
+        idle_ttl=SESSION_IDLE_DAYS * 86400,
+        update_interval=SESSION_FLUSH_INTERVAL,
+        shard=worker,
+    )
+
+    # История доходностей и цен: читается с диска без обращения к бирже
+    history_store = HistoryStore(HISTORY_DIR)
+
+
+def fetcher_main():
+    global history_store
+
+    # Процессу загрузки нужна только история: подписки и сессии - у воркеров
+    history_store = HistoryStore(HISTORY_DIR)
+    asyncio.run(run_fetcher())
+
+
+def worker_main(index, count, queue):
+    """
+    Процесс-воркер: свои подписки и своя доля сессий, общий снимок доски
+    """
+    global shared_board, board_stale_after
+
+    init_services(worker=(index, count))
+
+    # Колонки снимка остаются общими страницами файла, а не копией в каждом воркере
+    enable_copy_on_write()
+    shared_board = SharedSnapshotReader(SHARED_BOARD_DIR)
+    board_cache.loader = load_shared_board
+    # Запас на загрузку и публикацию: снимок от процесса загрузки
+    # в норме бывает старше TTL на время загрузки доски
+    board_stale_after = 2 * BOARD_CACHE_TTL
+    board_cache.ttl = board_stale_after
+
+    asyncio.run(run_worker(build_application(), queue))
+
+
+def run_workers(args):
+    """
+    Процесс загрузки, args.workers воркеров и распределитель обновлений
+    (в этом процессе): обновления одного чата всегда идут в один воркер
+    """
+    # Без секрета webhook не запустится - проверяем до запуска процессов
+    secret_token = webhook_secret(WEBHOOK_SECRET, args.webhook_url) if args.mode == 'webhook' else None
+
+    context = multiprocessing.get_context('spawn')
+    queues = [context.Queue() for _ in range(args.workers)]
+
+    processes = [context.Process(target=fetcher_main, name='fetcher')]
+    processes += [
+        context.Process(target=worker_main, args=(index, args.workers, queue), name=f'worker-{index}')
+        for index, queue in enumerate(queues)
+    ]
+    for process in processes:
+        process.start()
+
+    bot = Bot(TOKEN, base_url=f"{TELEGRAM_API_URL}/bot", base_file_url=f"{TELEGRAM_API_URL}/file/bot")
+    try:
+        asyncio.run(run_router(
+            bot,
+            queues,
+            mode=args.mode,
+            listen=args.listen,
+            port=args.port,
+            url_path=WEBHOOK_PATH,
+            webhook_url=args.webhook_url,
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES,
+        ))
+    finally:
+        for queue in queues:
+            queue.put(None)
+        processes[0].terminate()
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.kill()
+
+
+def main():
+    """
+    Основная функция запуска бота
+    """
+    args = parse_args()
+
+    if args.workers > 1:
+        print(f"🤖 Бот запущен! Режим: {args.mode}, воркеров: {args.workers}")
+        run_workers(args)
+        return
+
+    init_services()
+    application = build_application()
 
     # Запускаем бота
-    print("🤖 Бот запущен!")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    print(f"🤖 Бот запущен! Режим: {args.mode}")
+    if args.mode == 'webhook':
+        asyncio.run(run_webhook(
+            application,
+            listen=args.listen,
+            port=args.port,
+            url_path=WEBHOOK_PATH,
+            webhook_url=args.webhook_url,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+        ))
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 # ========================================
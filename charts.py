@@ -0,0 +1,179 @@
+import asyncio
+import io
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+# ========================================
+# ОТРИСОВКА ГРАФИКОВ (В ДОЧЕРНИХ ПРОЦЕССАХ)
+# ========================================
+
+# Виды графиков - первая часть ключа кэша
+YIELD_HISTORY = 'history'
+YIELD_SCATTER = 'scatter'
+
+
+def _figure():
+    # matplotlib импортируется только в процессах пула: основному процессу он не нужен
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 4.5), dpi=100)
+    ax.grid(True, alpha=0.3)
+    return plt, fig, ax
+
+
+def _png(plt, fig):
+    buffer = io.BytesIO()
+    fig.tight_layout()
+    fig.savefig(buffer, format='png')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def render_yield_history(dates, yields, title):
+    """
+    Линия доходности бумаги по дням: dates - datetime64, yields - % годовых
+    """
+    plt, fig, ax = _figure()
+
+    ax.plot(dates, yields, color='tab:blue', linewidth=1.5)
+    ax.set_title(title)
+    ax.set_ylabel('Доходность, %')
+    fig.autofmt_xdate()
+
+    return _png(plt, fig)
+
+
+def render_yield_scatter(years, yields, labels, title):
+    """
+    Доходность против срока до погашения с подписями SECID у точек
+    """
+    plt, fig, ax = _figure()
+
+    ax.scatter(years, yields, color='tab:green')
+    for x, y, label in zip(years, yields, labels):
+        ax.annotate(label, (x, y), textcoords='offset points', xytext=(4, 4), fontsize=8)
+
+    ax.set_title(title)
+    ax.set_xlabel('Лет до погашения')
+    ax.set_ylabel('Доходность, %')
+
+    return _png(plt, fig)
+
+
+# ========================================
+# СЕРВИС ГРАФИКОВ
+# ========================================
+
+class ChartService:
+    """
+    Графики в PNG с кэшем по ключу (вид графика, SECID, версия снимка).
+
+    Отрисовка идёт в пуле процессов и не блокирует event loop; одновременные
+    запросы одного графика ждут одну отрисовку. После первой отправки
+    в Telegram запоминается file_id, и повторные показы не передают PNG вовсе.
+    """
+
+    def __init__(self, max_workers=2, max_size=256):
+        self.max_workers = max_workers
+        self.max_size = max_size
+
+        self._pool = None
+        self._png = OrderedDict()
+        self._file_ids = OrderedDict()
+        self._pending = {}
+
+        self.renders = 0
+        self.uploads = 0
+        self.reused = 0
+
+    def _executor(self):
+        # spawn: дочерние процессы не наследуют потоки и event loop бота
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return self._pool
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_size:
+            cache.popitem(last=False)
+
+    async def photo(self, key, render, *args):
+        """
+        Что передать в send_photo: file_id, если график уже отправлялся,
+        иначе PNG. None - если отрисовать не удалось
+        """
+        file_id = self._file_ids.get(key)
+        if file_id is not None:
+            self._file_ids.move_to_end(key)
+            self.reused += 1
+            return file_id
+
+        png = self._png.get(key)
+        if png is not None:
+            return png
+
+        pending = self._pending.get(key)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = loop.run_in_executor(self._executor(), render, *args)
+            self._pending[key] = pending
+
+        try:
+            png = await pending
+        except Exception as e:
+            print(f"Ошибка отрисовки графика {key}: {e}")
+            return None
+        finally:
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+                self.renders += 1
+
+        if key not in self._file_ids:
+            self._remember(self._png, key, png)
+        return png
+
+    def uploaded(self, key, message):
+        """
+        Запоминание file_id отправленного графика: PNG больше не нужен
+        """
+        if message is None or not message.photo:
+            return
+
+        self._remember(self._file_ids, key, message.photo[-1].file_id)
+        self._png.pop(key, None)
+        self.uploads += 1
+
+    async def send(self, bot, chat_id, key, render, *args, caption=None):
+        """
+        Отправка графика в чат с запоминанием file_id
+        """
+        photo = await self.photo(key, render, *args)
+        if photo is None:
+            return None
+
+        message = await bot.send_photo(chat_id, photo=photo, caption=caption)
+        if isinstance(photo, bytes):
+            self.uploaded(key, message)
+        return message
+
+    def stats(self):
+        return {
+            'renders': self.renders,
+            'uploads': self.uploads,
+            'reused': self.reused,
+            'png': len(self._png),
+            'file_ids': len(self._file_ids),
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+
+# ========================================
+# КАЛЕНДАРЬ КУПОНОВ И ПОГАШЕНИЙ
+# ========================================
+
+# Виды выплат в календаре
+COUPON = 0
+REDEMPTION = 1
+
+PAYMENT_KINDS = {COUPON: 'купон', REDEMPTION: 'погашение'}
+
+# Колонки помесячной проекции выплат
+PAYMENT_COLUMNS = {COUPON: 'coupons', REDEMPTION: 'redemptions'}
+
+
+class CouponCalendar:
+    """
+    Календарь выплат по облигациям на плоских массивах, отсортированных по дате.
+
+    Каждая выплата - это дата, SECID, сумма в рублях и вид (купон/погашение).
+    Выборка за период - два бинарных поиска по массиву дат и срез.
+    """
+
+    def __init__(self, dates, secids, amounts, kinds):
+        order = np.argsort(dates, kind='stable')
+
+        self.dates = np.asarray(dates, dtype='datetime64[D]')[order]
+        self.secids = np.asarray(secids, dtype=object)[order]
+        self.amounts = np.asarray(amounts, dtype=float)[order]
+        self.kinds = np.asarray(kinds, dtype=np.int8)[order]
+
+    @classmethod
+    def from_frames(cls, coupons, redemptions):
+        """
+        Календарь из таблиц купонов и погашений с колонками secid, date, value_rub
+        """
+        frames = [
+            coupons.assign(kind=COUPON),
+            redemptions.assign(kind=REDEMPTION),
+        ]
+        df = pd.concat(frames, ignore_index=True)
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df = df.dropna(subset=['date'])
+
+        return cls(
+            df['date'].to_numpy(dtype='datetime64[D]'),
+            df['secid'].to_numpy(dtype=object),
+            pd.to_numeric(df['value_rub'], errors='coerce').to_numpy(dtype=float),
+            df['kind'].to_numpy(dtype=np.int8),
+        )
+
+    @classmethod
+    def empty(cls):
+        """
+        Календарь без выплат (например, если загрузить графики не удалось)
+        """
+        return cls(np.empty(0, dtype='datetime64[D]'), np.empty(0, dtype=object),
+                   np.empty(0, dtype=float), np.empty(0, dtype=np.int8))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def between(self, start, end):
+        """
+        Выплаты с start по end включительно в виде DataFrame, по возрастанию даты
+        """
+        start = np.datetime64(pd.Timestamp(start).date(), 'D')
+        end = np.datetime64(pd.Timestamp(end).date(), 'D')
+
+        left = np.searchsorted(self.dates, start, side='left')
+        right = np.searchsorted(self.dates, end, side='right')
+
+        return pd.DataFrame({
+            'date': self.dates[left:right],
+            'secid': self.secids[left:right],
+            'amount': self.amounts[left:right],
+            'kind': self.kinds[left:right],
+        })
+
+    def project(self, quantities, start, end, fallback_amounts=None):
+        """
+        Помесячный поток выплат по портфелю за период.
+
+        quantities - Series: SECID -> количество бумаг; fallback_amounts -
+        Series: SECID -> размер купона для ещё не объявленных купонов.
+        Возвращает DataFrame с индексом-месяцем и колонками coupons, redemptions
+        """
+        payments = self.between(start, end)
+        payments = payments[payments['secid'].isin(quantities.index)]
+
+        amounts = payments['amount']
+        if fallback_amounts is not None:
+            is_coupon = payments['kind'] == COUPON
+            fallback = payments['secid'].map(fallback_amounts)
+            amounts = amounts.where(amounts.notna() | ~is_coupon, fallback)
+
+        flows = pd.DataFrame({
+            'month': payments['date'].to_numpy().astype('datetime64[M]'),
+            'kind': payments['kind'].map(PAYMENT_COLUMNS),
+            'value': amounts.fillna(0) * payments['secid'].map(quantities),
+        })
+
+        table = flows.pivot_table(index='month', columns='kind', values='value', aggfunc='sum', fill_value=0.0)
+        return table.reindex(columns=list(PAYMENT_COLUMNS.values()), fill_value=0.0)
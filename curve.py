@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+
+# ========================================
+# КРИВАЯ ДОХОДНОСТИ ОФЗ
+# ========================================
+
+# Режим торгов ОФЗ: по этим бумагам строится кривая
+OFZ_BOARD = 'TQOB'
+
+# Сетка параметров формы кривой (лет): для каждого значения коэффициенты
+# подбираются линейным МНК, лучшая точка сетки - по сумме квадратов остатков
+TAU_GRID = np.geomspace(0.25, 15.0, 40)
+
+# Второй параметр формы Свенссона - не ближе этого отношения к первому:
+# при близких параметрах факторы почти совпадают, и коэффициенты разлетаются
+SVENSSON_TAU_RATIO = 2.0
+
+# Предел модуля коэффициентов кривой, п.п.: подбор с большими коэффициентами -
+# взаимно гасящиеся факторы, которые вне данных дают бессмысленные доходности
+BETA_LIMIT = 30.0
+
+# Сроки для таблицы /curve, лет
+CURVE_TENORS = [0.5, 1, 2, 3, 5, 7, 10, 15, 20]
+
+
+def curve_basis(t, taus):
+    """
+    Факторы Нельсона-Сигеля для сроков t (n) и набора параметров taus (g x m).
+
+    m=1 - модель Нельсона-Сигеля (3 фактора), m=2 - Свенссона (4 фактора).
+    Возвращает массив g x n x (m + 2)
+    """
+    x = t[None, :, None] / taus[:, None, :]
+    decay = np.exp(-x)
+    slope = (1.0 - decay) / x
+    hump = slope - decay
+
+    level = np.ones(x.shape[:2] + (1,))
+    return np.concatenate([level, slope[:, :, :1], hump], axis=2)
+
+
+class YieldCurve:
+    """
+    Подобранная кривая: доходность в % как функция срока в годах
+    """
+
+    def __init__(self, betas, taus, rmse, count, max_term=None, min_term=None):
+        self.betas = np.asarray(betas, dtype=float)
+        self.taus = np.asarray(taus, dtype=float)
+        self.rmse = rmse
+        self.count = count
+        # Самый короткий и самый длинный сроки среди бумаг подбора:
+        # за их пределами кривая - экстраполяция
+        self.min_term = min_term
+        self.max_term = max_term
+
+    def covers(self, t):
+        """
+        Маска сроков, которые лежат в пределах данных подбора
+        """
+        t = np.asarray(t, dtype=float)
+        inside = np.isfinite(t)
+        if self.min_term is not None:
+            inside &= t >= self.min_term
+        if self.max_term is not None:
+            inside &= t <= self.max_term
+        return inside
+
+    @property
+    def model(self):
+        return "Свенссон" if len(self.taus) == 2 else "Нельсон-Сигель"
+
+    def __call__(self, t):
+        t = np.clip(np.asarray(t, dtype=float), 1e-6, None)
+        return curve_basis(np.atleast_1d(t), self.taus[None, :])[0] @ self.betas
+
+
+def fit_curve(durations, yields, min_points=4, svensson_points=8):
+    """
+    Подбор кривой по срокам (годы) и доходностям (%).
+
+    Для всей сетки параметров формы коэффициенты считаются сразу - одним
+    пакетным решением нормальных уравнений. Модель Свенссона используется,
+    когда точек не меньше svensson_points; если все её подборы дают
+    коэффициенты больше BETA_LIMIT - Нельсона-Сигеля. Меньше min_points
+    или нет ни одного подбора в пределах BETA_LIMIT - None
+    """
+    t = np.asarray(durations, dtype=float)
+    y = np.asarray(yields, dtype=float)
+    valid = np.isfinite(t) & np.isfinite(y) & (t > 0)
+    t, y = t[valid], y[valid]
+
+    if len(t) < min_points:
+        return None
+
+    if len(t) >= svensson_points:
+        first, second = np.meshgrid(TAU_GRID, TAU_GRID, indexing='ij')
+        pairs = second >= SVENSSON_TAU_RATIO * first
+        curve = _fit_grid(t, y, np.column_stack([first[pairs], second[pairs]]))
+        if curve is not None:
+            return curve
+
+    return _fit_grid(t, y, TAU_GRID[:, None])
+
+
+def _fit_grid(t, y, taus):
+    # Лучший по остаткам подбор на сетке taus среди подборов с ограниченными коэффициентами
+    X = curve_basis(t, taus)
+    Xt = X.transpose(0, 2, 1)
+
+    # Небольшая регуляризация: соседние факторы на коротких выборках почти коллинеарны
+    gram = Xt @ X + 1e-8 * np.eye(X.shape[2])
+    betas = np.linalg.solve(gram, (Xt @ y)[..., None])[..., 0]
+
+    residuals = (X @ betas[..., None])[..., 0] - y
+    sse = (residuals ** 2).sum(axis=1)
+    sse[~(np.abs(betas) <= BETA_LIMIT).all(axis=1)] = np.inf
+
+    best = int(np.argmin(sse))
+    if not np.isfinite(sse[best]):
+        return None
+
+    return YieldCurve(betas[best], taus[best], float(np.sqrt(sse[best] / len(t))), len(t),
+                      max_term=float(t.max()), min_term=float(t.min()))
+
+
+def fit_ofz_curve(df, board=OFZ_BOARD):
+    """
+    Кривая по ОФЗ снимка: доходность к погашению против дюрации
+    """
+    if df.empty:
+        return None
+
+    ytm = df['YTM'].to_numpy(dtype=float)
+    duration = df['DURATION'].to_numpy(dtype=float)
+
+    # Явные выбросы (бумаги без сделок, ошибки цены) не участвуют в подборе
+    mask = (df['BOARDID'].astype(str).to_numpy() == board) & (ytm > 0) & (ytm < 40) & (duration > 0.05)
+    return fit_curve(duration[mask], ytm[mask])
+
+
+def add_spread_column(df, curve):
+    """
+    Колонка SPREAD - спред доходности к кривой ОФЗ той же дюрации, б.п.
+    """
+    if df.empty:
+        return df
+
+    if curve is None:
+        df['SPREAD'] = np.nan
+        return df
+
+    # Вне сроков подбора кривая - экстраполяция, спред к ней не считаем
+    duration = df['DURATION'].to_numpy(dtype=float)
+    spread = (df['YTM'].to_numpy(dtype=float) - curve(duration)) * 100.0
+    df['SPREAD'] = np.where(curve.covers(duration), spread, np.nan)
+    return df
+
+
+def curve_table(curve, tenors=CURVE_TENORS):
+    """
+    Доходности кривой на стандартных сроках в пределах данных подбора:
+    DataFrame с колонками tenor, yield
+    """
+    tenors = [tenor for tenor in tenors if curve.covers(tenor)]
+    return pd.DataFrame({'tenor': tenors, 'yield': curve(tenors)})
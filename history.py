@@ -0,0 +1,194 @@
+import os
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+# ========================================
+# ИСТОРИЯ ДОХОДНОСТЕЙ И ЦЕН
+# ========================================
+
+# Файлы хранилища: по одному плоскому массиву на поле, записи только дописываются
+HISTORY_FIELDS = {
+    'dates': np.int32,      # дни от 1970-01-01
+    'codes': np.int32,      # номер SECID в secids.txt
+    'yield': np.float32,    # YIELDCLOSE, %
+    'price': np.float32,    # CLOSE, % от номинала
+}
+
+# Согласованное состояние хранилища: массивы, индекс по SECID и справочник кодов.
+# Меняется целиком одной операцией присваивания, поэтому чтение не видит полузаписанных данных
+HistoryState = namedtuple('HistoryState', 'arrays order offsets secids codes')
+
+
+class HistoryStore:
+    """
+    Локальная история YIELDCLOSE и цены по SECID.
+
+    Каждое поле хранится отдельным файлом float32/int32 и открывается через
+    memory map. Новый торговый день только дописывается в конец файлов.
+    Индекс по SECID (перестановка записей, сгруппированных по коду бумаги,
+    и смещения групп) строится в памяти при открытии и после дописывания.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self._state = self._load()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        secids = []
+        if os.path.exists(self._path('secids.txt')):
+            with open(self._path('secids.txt'), encoding='utf-8') as f:
+                secids = f.read().split()
+
+        arrays = {}
+        for field, dtype in HISTORY_FIELDS.items():
+            path = self._path(f'{field}.bin')
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            count = size // np.dtype(dtype).itemsize
+            arrays[field] = np.memmap(path, dtype=dtype, mode='r', shape=(count,)) if count else np.empty(0, dtype)
+
+        # Видны только записи, подтверждённые курсором: хвост оборванной
+        # записи дня (файлы разной длины) отбрасывается при следующей записи
+        count = min(len(array) for array in arrays.values())
+        committed = self._read_cursor()[1]
+        if committed is not None:
+            count = min(count, committed)
+        arrays = {field: array[:count] for field, array in arrays.items()}
+
+        # Индекс по SECID: записи каждой бумаги подряд, внутри - по дате
+        order = np.lexsort((arrays['dates'], arrays['codes']))
+        offsets = np.searchsorted(arrays['codes'][order], np.arange(len(secids) + 1))
+
+        cursor = self._path('cursor.txt')
+        self._cursor_mtime = os.path.getmtime(cursor) if os.path.exists(cursor) else None
+
+        return HistoryState(arrays, order, offsets, secids, {secid: code for code, secid in enumerate(secids)})
+
+    def __len__(self):
+        return len(self._state.arrays['dates'])
+
+    def refresh(self):
+        """
+        Перечитывание хранилища, если его дописал другой процесс.
+        Возвращает True, если данные обновились
+        """
+        path = self._path('cursor.txt')
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if mtime == self._cursor_mtime:
+            return False
+
+        self._state = self._load()
+        return True
+
+    def _read_cursor(self):
+        """
+        Курсор: (последний обработанный день, число подтверждённых записей).
+        В курсорах старого формата записан только день
+        """
+        path = self._path('cursor.txt')
+        if not os.path.exists(path):
+            return None, None
+        with open(path) as f:
+            parts = f.read().split()
+        return date.fromisoformat(parts[0]), int(parts[1]) if len(parts) > 1 else None
+
+    def _write_cursor(self, day, count):
+        path = self._path('cursor.txt')
+        with open(f"{path}.tmp", 'w') as f:
+            f.write(f"{day.isoformat()} {count}")
+        os.replace(f"{path}.tmp", path)
+
+    @property
+    def checked_until(self):
+        """
+        Последний день, за который история уже запрашивалась (None - ни разу)
+        """
+        return self._read_cursor()[0]
+
+    def append_day(self, day, df):
+        """
+        Дописывание одного торгового дня: df с колонками SECID, YIELDCLOSE, CLOSE.
+        Дни не позже уже обработанного пропускаются
+        """
+        checked_until = self.checked_until
+        if checked_until is not None and day <= checked_until:
+            return
+
+        state = self._state
+        secids = list(state.secids)
+        codes = dict(state.codes)
+
+        # Новые бумаги получают следующие коды
+        new_secids = [secid for secid in pd.unique(df['SECID']) if secid not in codes]
+        for secid in new_secids:
+            codes[secid] = len(secids)
+            secids.append(secid)
+
+        if new_secids:
+            with open(self._path('secids.txt'), 'a', encoding='utf-8') as f:
+                f.write(''.join(f'{secid}\n' for secid in new_secids))
+
+        day_number = (np.datetime64(day, 'D') - np.datetime64('1970-01-01', 'D')).astype(np.int32)
+        columns = {
+            'dates': np.full(len(df), day_number, dtype=np.int32),
+            'codes': df['SECID'].map(codes).to_numpy(dtype=np.int32),
+            'yield': pd.to_numeric(df['YIELDCLOSE'], errors='coerce').to_numpy(dtype=np.float32),
+            'price': pd.to_numeric(df['CLOSE'], errors='coerce').to_numpy(dtype=np.float32),
+        }
+
+        # Сначала отрезаем неподтверждённый хвост прошлой записи, иначе поля разойдутся
+        count = len(state.arrays['dates'])
+        for field, dtype in HISTORY_FIELDS.items():
+            path = self._path(f'{field}.bin')
+            with open(path, 'ab') as f:
+                f.truncate(count * np.dtype(dtype).itemsize)
+                columns[field].tofile(f)
+
+        # День подтверждается курсором только после записи всех полей
+        self._write_cursor(day, count + len(df))
+
+        self._state = self._load()
+
+    def series(self, secid, start=None):
+        """
+        История бумаги: DataFrame с колонками date, yield, price по возрастанию даты
+        """
+        state = self._state
+        code = state.codes.get(secid)
+        if code is None:
+            return pd.DataFrame(columns=['date', 'yield', 'price'])
+
+        rows = state.order[state.offsets[code]:state.offsets[code + 1]]
+        dates = state.arrays['dates'][rows]
+
+        if start is not None:
+            start_number = (np.datetime64(start, 'D') - np.datetime64('1970-01-01', 'D')).astype(np.int32)
+            first = np.searchsorted(dates, start_number)
+            rows, dates = rows[first:], dates[first:]
+
+        return pd.DataFrame({
+            'date': dates.astype('datetime64[D]'),
+            'yield': state.arrays['yield'][rows],
+            'price': state.arrays['price'][rows],
+        })
+
+    def missing_days(self, today, depth=365):
+        """
+        Рабочие дни, за которые историю ещё не запрашивали: от последнего
+        обработанного (или today - depth) до вчерашнего
+        """
+        first = today - timedelta(days=depth)
+        checked_until = self.checked_until
+        if checked_until is not None and checked_until >= first:
+            first = checked_until + timedelta(days=1)
+
+        days = pd.bdate_range(first, today - timedelta(days=1))
+        return [day.date() for day in days]
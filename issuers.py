@@ -0,0 +1,92 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# ========================================
+# КЛАССИФИКАЦИЯ ЭМИТЕНТОВ
+# ========================================
+
+# Категории в порядке убывания надёжности: (метка, ключевые слова в названии)
+ISSUER_CATEGORIES = [
+    ("🇷🇺 AAA (ОФЗ)", ['офз', 'федеральн']),
+    ("🏛️ AA (Госкорп.)", ['вэб', 'ржд', 'росатом', 'роснефть', 'газпром', 'транснефть',
+                         'акционерная энергетическая компания']),
+    ("🏦 A+ (Системный банк)", ['сбербанк', 'втб']),
+    ("🏭 A (Крупная компания)", ['газпром', 'лукойл', 'сургутнефтегаз', 'норникель', 'алроса', 'мтс', 'мегафон']),
+]
+
+DEFAULT_CATEGORY = "📊 BBB (Иные эмитенты)"
+
+
+class IssuerClassifier:
+    """
+    Классификатор эмитентов по названию выпуска.
+
+    Все ключевые слова собраны в одно регулярное выражение, которое проходит
+    по колонке названий один раз. Результат запоминается по SECID, поэтому
+    при следующих обновлениях справочника классифицируются только новые
+    бумаги и бумаги со сменившимся названием.
+    """
+
+    def __init__(self, categories=ISSUER_CATEGORIES, default=DEFAULT_CATEGORY):
+        self.labels = [label for label, _ in categories] + [default]
+        self.default_rank = len(categories)
+
+        # Слово из нескольких категорий относится к самой надёжной из них
+        self._keyword_rank = {}
+        for rank, (_, keywords) in enumerate(categories):
+            for keyword in keywords:
+                self._keyword_rank.setdefault(keyword, rank)
+
+        # Длинные слова раньше коротких, чтобы альтернатива не обрывалась на префиксе
+        keywords = sorted(self._keyword_rank, key=len, reverse=True)
+        self._pattern = re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+
+        # SECID -> (текст, по которому классифицировали, ранг)
+        self._memo = {}
+
+    def _rank(self, matches):
+        return min((self._keyword_rank[match] for match in matches), default=self.default_rank)
+
+    def classify(self, secids, texts):
+        """
+        Ранги категорий (0 - самая надёжная) для бумаг в виде массива int8
+        """
+        secids = list(secids)
+        texts = pd.Series(texts, dtype=object).fillna('').str.lower().tolist()
+
+        stale = [
+            i for i, (secid, text) in enumerate(zip(secids, texts))
+            if self._memo.get(secid, (None,))[0] != text
+        ]
+
+        if stale:
+            matches = pd.Series([texts[i] for i in stale], dtype=object).str.findall(self._pattern)
+            for i, found in zip(stale, matches):
+                self._memo[secids[i]] = (texts[i], self._rank(found))
+
+        return np.fromiter((self._memo[secid][1] for secid in secids), dtype=np.int8, count=len(secids))
+
+    def label(self, rank):
+        return self.labels[rank]
+
+    def __len__(self):
+        return len(self._memo)
+
+
+def add_issuer_columns(df, classifier):
+    """
+    Колонки ISSUER_RANK и ISSUER_RATING для справочника с индексом SECID
+    """
+    if df.empty:
+        return df
+
+    texts = df['SHORTNAME'].fillna('') + ' ' + df['SECNAME'].fillna('')
+    ranks = classifier.classify(df.index, texts)
+
+    df['ISSUER_RANK'] = ranks
+    df['ISSUER_RATING'] = pd.Categorical.from_codes(ranks, categories=classifier.labels)
+
+    return df
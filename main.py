@@ -39,14 +39,35 @@ from aiogram import Bot, Dispatcher, F
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message, InputFile
 from aiogram.types.input_file import FSInputFile
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
 from config import TOKEN
 import gtts
 from deep_translator import GoogleTranslator
 import os
+from send_scheduler import LIMITED_METHODS, SendScheduler
 
 bot = Bot(token=TOKEN)
 dp = Dispatcher()
 
+# Общий планировщик отправки: лимиты Telegram на бота и на чат, повтор после 429
+send_scheduler = SendScheduler()
+
+
+class SendSchedulerMiddleware(BaseRequestMiddleware):
+    """Отправка сообщений бота через планировщик (текст и озвучка идут подряд в один чат)"""
+
+    async def __call__(self, make_request, bot, method):
+        if not method.__api_method__.startswith(LIMITED_METHODS):
+            return await make_request(bot, method)
+
+        return await send_scheduler.submit(
+            lambda: make_request(bot, method),
+            chat_id=getattr(method, 'chat_id', None),
+        )
+
+
+bot.session.middleware(SendSchedulerMiddleware())
+
 
 @dp.message(Command('help'))
 async def help(message: Message):
@@ -0,0 +1,149 @@
+import asyncio
+import random
+
+import httpx
+
+
+# ========================================
+# НАСТРОЙКИ КЛИЕНТА ISS
+# ========================================
+
+ISS_BASE_URL = "https://iss.moex.com/iss"
+
+# Таймауты по типам запросов, секунд: доска большая, карточка бумаги - маленькая
+ENDPOINT_TIMEOUTS = {
+    'board': 15,
+    'security': 5,
+    'statistics': 5,
+    'default': 10,
+}
+
+# Ответы, после которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Предел страниц блока без курсора: защита от ответа, который не учитывает start=
+MAX_PAGES = 200
+
+
+class MoexClient:
+    """
+    Асинхронный клиент ISS Московской биржи.
+
+    Держит один пул соединений с keep-alive, ограничивает число
+    одновременных запросов и повторяет неудачные запросы
+    с экспоненциальной задержкой и случайным разбросом.
+    """
+
+    def __init__(self, base_url=ISS_BASE_URL, max_connections=10, max_concurrency=8,
+                 retries=3, backoff=0.5, timeouts=None):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.timeouts = {**ENDPOINT_TIMEOUTS, **(timeouts or {})}
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+
+    def _get_client(self):
+        # Клиент создаётся лениво, уже внутри работающего event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=30,
+                ),
+                params={'iss.meta': 'off'},
+                headers={'Accept': 'application/json'},
+            )
+        return self._client
+
+    def _timeout(self, endpoint):
+        return httpx.Timeout(self.timeouts.get(endpoint, self.timeouts['default']))
+
+    async def get_json(self, path, params=None, endpoint='default'):
+        """
+        GET-запрос к ISS с повторами; возвращает разобранный JSON
+        """
+        client = self._get_client()
+        timeout = self._timeout(endpoint)
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    response = await client.get(path, params=params, timeout=timeout)
+                response.raise_for_status()
+                return response.json()
+
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = (
+                    isinstance(e, httpx.TransportError)
+                    or e.response.status_code in RETRY_STATUSES
+                )
+                if not retryable or attempt == self.retries:
+                    raise
+
+                # Экспоненциальная задержка с полным случайным разбросом
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                print(f"ISS {path}: {e.__class__.__name__}, повтор через {delay:.2f} с")
+                await asyncio.sleep(delay)
+
+    async def get_block(self, path, block, params=None, endpoint='default', window=4):
+        """
+        Все строки блока ответа ISS с учётом постраничной выдачи (параметр start=).
+
+        Если ISS отдаёт курсор блока, остальные страницы запрашиваются
+        параллельно, не больше window одновременно. Без курсора страницы
+        читаются по очереди, пока не придёт неполная или пустая страница,
+        повтор предыдущей страницы (ISS не учёл start=) или не наберётся MAX_PAGES.
+        Возвращает (колонки, строки)
+        """
+        params = {**(params or {}), 'iss.only': f'{block},{block}.cursor'}
+
+        first = await self.get_json(path, params={**params, 'start': 0}, endpoint=endpoint)
+        columns = first[block]['columns']
+        rows = list(first[block]['data'])
+
+        cursor = first.get(f'{block}.cursor')
+        if cursor and cursor['data']:
+            cursor = dict(zip(cursor['columns'], cursor['data'][0]))
+            total, page_size = cursor['TOTAL'], cursor['PAGESIZE']
+
+            semaphore = asyncio.Semaphore(window)
+
+            async def fetch_page(start):
+                async with semaphore:
+                    data = await self.get_json(path, params={**params, 'start': start}, endpoint=endpoint)
+                return data[block]['data']
+
+            pages = await asyncio.gather(*(fetch_page(start) for start in range(page_size, total, page_size)))
+            for page in pages:
+                rows.extend(page)
+
+        elif rows:
+            page_size = len(rows)
+            previous = rows
+            for _ in range(MAX_PAGES - 1):
+                data = await self.get_json(path, params={**params, 'start': len(rows)}, endpoint=endpoint)
+                page = data[block]['data']
+                if not page or page == previous:
+                    break
+
+                rows.extend(page)
+                previous = page
+                if len(page) < page_size:
+                    break
+            else:
+                print(f"ISS {path}: больше {MAX_PAGES} страниц блока {block}, выдача обрезана")
+
+        return columns, rows
+
+    async def close(self):
+        """
+        Закрытие пула соединений
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
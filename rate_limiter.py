@@ -0,0 +1,44 @@
+from telegram.ext import BaseRateLimiter
+
+from send_scheduler import INTERACTIVE, LIMITED_METHODS
+
+
+# ========================================
+# ЛИМИТЫ ОТПРАВКИ ДЛЯ PYTHON-TELEGRAM-BOT
+# ========================================
+
+class SchedulerRateLimiter(BaseRateLimiter):
+    """
+    Подключение SendScheduler к python-telegram-bot (ApplicationBuilder.rate_limiter).
+
+    rate_limit_args - словарь: {'priority': BULK} для рассылок,
+    {'placeholder': True} для правки-заглушки
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        await self.scheduler.close()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if not endpoint.startswith(LIMITED_METHODS):
+            return await callback(*args, **kwargs)
+
+        rate_limit_args = rate_limit_args or {}
+        chat_id = data.get('chat_id')
+
+        edit_key = None
+        if endpoint == 'editMessageText' and 'message_id' in data:
+            edit_key = (chat_id, data['message_id'])
+
+        return await self.scheduler.submit(
+            lambda: callback(*args, **kwargs),
+            chat_id=chat_id,
+            priority=rate_limit_args.get('priority', INTERACTIVE),
+            edit_key=edit_key,
+            placeholder=rate_limit_args.get('placeholder', False),
+        )
@@ -0,0 +1,155 @@
+import re
+from collections import defaultdict, namedtuple
+
+import numpy as np
+
+
+# ========================================
+# ПОИСК ОБЛИГАЦИЙ ПО SECID И НАЗВАНИЮ
+# ========================================
+
+# Минимальная похожесть по триграммам для нечёткого поиска
+FUZZY_THRESHOLD = 0.25
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Готовый индекс: меняется целиком при перестроении, поэтому поиск
+# никогда не видит наполовину построенные массивы
+SearchState = namedtuple('SearchState', 'secids shortnames secnames keys owners fields grams gram_counts')
+
+
+def trigrams(text):
+    """
+    Множество триграмм строки с пробелами по краям (короткие запросы тоже дают триграммы)
+    """
+    text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _empty_state():
+    return SearchState(
+        np.empty(0, dtype=object), np.empty(0, dtype=object), np.empty(0, dtype=object),
+        np.empty(0, dtype=object), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int8),
+        {}, np.empty(0, dtype=np.int32),
+    )
+
+
+class BondSearch:
+    """
+    Поиск облигаций по префиксу SECID, краткого и полного названия
+    с нечётким поиском по триграммам, если по префиксу ничего не нашлось.
+
+    Префиксный индекс - отсортированный массив ключей (строки целиком и
+    отдельные слова) с номером бумаги и поля: все ключи с данным префиксом
+    лежат подряд и находятся двумя бинарными поисками.
+    """
+
+    def __init__(self):
+        self._state = _empty_state()
+        self.builds = 0
+
+    def __len__(self):
+        return len(self._state.secids)
+
+    def rebuild(self, df):
+        """
+        Перестроение индекса по справочнику (индекс или колонка SECID,
+        колонки SHORTNAME и SECNAME). Порядок строк - порядок выдачи
+        при равном приоритете поля
+        """
+        if len(df) == 0:
+            return
+
+        secids = df['SECID'] if 'SECID' in df.columns else df.index.to_series()
+
+        # Поля в порядке приоритета: совпадение по SECID выше совпадения по названию
+        columns = [
+            secids.astype(str).to_numpy(dtype=object),
+            df['SHORTNAME'].fillna('').astype(str).to_numpy(dtype=object),
+            df['SECNAME'].fillna('').astype(str).to_numpy(dtype=object),
+        ]
+
+        keys, owners, fields = [], [], []
+        grams = defaultdict(list)
+        gram_counts = np.zeros(len(df), dtype=np.int32)
+
+        for owner, values in enumerate(zip(*columns)):
+            for field, value in enumerate(values):
+                value = value.lower()
+                if not value:
+                    continue
+
+                # Строка целиком (для запросов из нескольких слов) и каждое слово
+                for key in {value, *WORD_PATTERN.findall(value)}:
+                    keys.append(key)
+                    owners.append(owner)
+                    fields.append(field)
+
+            # Нечёткий поиск - по SECID и краткому названию
+            bond_grams = trigrams(f"{values[0]} {values[1]}".lower())
+            gram_counts[owner] = len(bond_grams)
+            for gram in bond_grams:
+                grams[gram].append(owner)
+
+        # Массив ссылок на строки Python: фиксированная ширина <U по самому длинному
+        # названию заняла бы в разы больше памяти. Сортировка и бинарный поиск
+        # по объектному массиву работают так же
+        keys = np.array(keys, dtype=object)
+        order = np.argsort(keys, kind='stable')
+
+        self._state = SearchState(
+            columns[0], columns[1], columns[2],
+            keys[order],
+            np.array(owners, dtype=np.int32)[order],
+            np.array(fields, dtype=np.int8)[order],
+            {gram: np.array(postings, dtype=np.int32) for gram, postings in grams.items()},
+            gram_counts,
+        )
+        self.builds += 1
+
+    def _prefix(self, state, query):
+        left = np.searchsorted(state.keys, query, side='left')
+        right = np.searchsorted(state.keys, query + '\uffff', side='right')
+        if left == right:
+            return np.empty(0, dtype=np.int32)
+
+        owners = state.owners[left:right]
+        fields = state.fields[left:right]
+        partial = state.keys[left:right] != query
+
+        # Сначала точные совпадения, затем лучшее поле, затем исходный порядок справочника
+        order = np.lexsort((owners, fields, partial))
+        owners = owners[order]
+        _, first = np.unique(owners, return_index=True)
+        return owners[np.sort(first)]
+
+    def _fuzzy(self, state, query, limit):
+        query_grams = [gram for gram in trigrams(query) if gram in state.grams]
+        if not query_grams:
+            return np.empty(0, dtype=np.int32)
+
+        shared = np.bincount(
+            np.concatenate([state.grams[gram] for gram in query_grams]),
+            minlength=len(state.secids),
+        )
+        # Коэффициент Жаккара по множествам триграмм
+        similarity = shared / (len(trigrams(query)) + state.gram_counts - shared)
+
+        candidates = np.flatnonzero(similarity >= FUZZY_THRESHOLD)
+        order = np.argsort(-similarity[candidates], kind='stable')
+        return candidates[order][:limit]
+
+    def search(self, query, limit=10):
+        """
+        Найденные бумаги: список (SECID, краткое название, полное название)
+        """
+        state = self._state
+        query = ' '.join(query.lower().split())
+        if not query or not len(state.secids):
+            return []
+
+        found = self._prefix(state, query)[:limit]
+        if not len(found):
+            found = self._fuzzy(state, query, limit)
+
+        return [(state.secids[i], state.shortnames[i], state.secnames[i]) for i in found]
@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import itertools
+import time
+import weakref
+from datetime import timedelta
+
+
+# ========================================
+# ПЛАНИРОВЩИК ИСХОДЯЩИХ СООБЩЕНИЙ
+# ========================================
+
+# Модуль не зависит от библиотеки бота: его используют и python-telegram-bot
+# (rate_limiter.py), и aiogram (main.py)
+
+# Классы приоритета: ответы пользователям раньше массовых рассылок
+INTERACTIVE = 0
+BULK = 1
+
+# Методы Bot API, на которые действуют лимиты Telegram на сообщения
+LIMITED_METHODS = ('send', 'edit', 'copy', 'forward')
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate токенов в секунду, не больше capacity про запас.
+
+    reserve() сразу забирает токен (баланс может уйти в минус) и возвращает,
+    сколько ждать до его появления, - поэтому ожидающие обслуживаются по очереди
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def pause(self, seconds):
+        """
+        Не выдавать токены ещё seconds секунд (после ответа 429)
+        """
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    def is_idle(self):
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class SendScheduler:
+    """
+    Общий планировщик отправки: глобальное ведро токенов на бота,
+    ведро на каждый чат и очередь с приоритетами к глобальному ведру.
+
+    Правка сообщения-заглушки ("⏳ Загружаю...") придерживается на
+    coalesce_window секунд: если за это время пришла окончательная правка
+    того же сообщения, заглушка не отправляется вовсе. Правки одного
+    сообщения уходят строго по очереди. На 429 запрос повторяется
+    через retry_after.
+    """
+
+    def __init__(self, global_rate=30, chat_rate=1.0, group_rate=20 / 60, chat_burst=3,
+                 coalesce_window=0.5, max_retries=3):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}
+
+        # Очередь к глобальному ведру: (приоритет, номер, future)
+        self._queue = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+
+        # (чат, сообщение) -> событие "заглушку заменила окончательная правка"
+        self._placeholders = {}
+        self._edit_locks = weakref.WeakValueDictionary()
+
+        self.sent = 0
+        self.retried = 0
+        self.coalesced = 0
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10000:
+                self._chats = {key: value for key, value in self._chats.items() if not value.is_idle()}
+
+            # Отрицательный chat_id - группа: там лимит 20 сообщений в минуту
+            group = isinstance(chat_id, int) and chat_id < 0
+            bucket = TokenBucket(self.group_rate if group else self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _dispatch(self):
+        while True:
+            while not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            delay = self._global.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+
+            # Очередь смотрим после паузы: успевший прийти срочный запрос пройдёт первым
+            while self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                if not waiter.done():
+                    waiter.set_result(None)
+                    break
+            else:
+                self._global.refund()
+
+    async def _acquire(self, chat_id, priority):
+        if chat_id is not None:
+            delay = self._chat_bucket(chat_id).reserve()
+            if delay:
+                await asyncio.sleep(delay)
+
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._counter), waiter))
+        self._wakeup.set()
+        await waiter
+
+    async def _send(self, send, chat_id, priority):
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                result = await send()
+                self.sent += 1
+                return result
+
+            except Exception as e:
+                retry_after = getattr(e, 'retry_after', None)
+                if retry_after is None or attempt == self.max_retries:
+                    raise
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+
+                print(f"Лимит Telegram, повтор через {retry_after} с")
+                self.retried += 1
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else self._global
+                bucket.pause(retry_after)
+
+    async def submit(self, send, chat_id=None, priority=INTERACTIVE, edit_key=None, placeholder=False):
+        """
+        Отправка через планировщик. send - функция без аргументов, возвращающая
+        корутину запроса (вызывается заново при повторе); edit_key - (чат, сообщение)
+        для правок. Для заменённой заглушки возвращает True без запроса
+        """
+        if edit_key is None:
+            return await self._send(send, chat_id, priority)
+
+        if placeholder:
+            superseded = asyncio.Event()
+            self._placeholders[edit_key] = superseded
+            try:
+                await asyncio.wait_for(superseded.wait(), self.coalesce_window)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if self._placeholders.get(edit_key) is superseded:
+                    del self._placeholders[edit_key]
+
+            if superseded.is_set():
+                self.coalesced += 1
+                return True
+        else:
+            superseded = self._placeholders.pop(edit_key, None)
+            if superseded is not None:
+                superseded.set()
+
+        lock = self._edit_locks.get(edit_key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._edit_locks[edit_key] = lock
+
+        async with lock:
+            return await self._send(send, chat_id, priority)
+
+    def stats(self):
+        return {
+            'queued': len(self._queue),
+            'chats': len(self._chats),
+            'sent': self.sent,
+            'retried': self.retried,
+            'coalesced': self.coalesced,
+        }
+
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
@@ -0,0 +1,268 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+
+# ========================================
+# СЕССИИ ПОЛЬЗОВАТЕЛЕЙ В SQLITE
+# ========================================
+
+# Ключи user_data, которые переживают перезапуск: только компактные ссылки
+# (версия снимка и смещение страницы, бумаги портфеля), а не сами данные
+SESSION_KEYS = ('bonds_ref', 'portfolio')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+"""
+
+
+def encode_session(user_data, keys=SESSION_KEYS):
+    """
+    Сессия в виде компактного JSON (None - сохранять нечего)
+    """
+    session = {key: user_data[key] for key in keys if user_data.get(key) is not None}
+    if not session:
+        return None
+    return json.dumps(session, ensure_ascii=False, separators=(',', ':'))
+
+
+def _as_tuples(value):
+    # JSON превращает кортежи в списки, а ссылки используются как ключи кэша
+    if isinstance(value, list):
+        return tuple(_as_tuples(item) for item in value)
+    return value
+
+
+def decode_session(text):
+    return {key: _as_tuples(value) for key, value in json.loads(text).items()}
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Хранилище user_data для python-telegram-bot в SQLite (режим WAL).
+
+    Application раз в update_interval секунд передаёт данные только тех
+    пользователей, от которых были обновления; из них записываются лишь
+    сессии, которые изменились (или давно не отмечались активными), -
+    одной транзакцией.
+    Запись идёт в отдельном потоке и не блокирует event loop.
+    Сессии, не менявшиеся дольше idle_ttl секунд, удаляются.
+
+    shard=(номер, всего) - база общая для нескольких воркеров: воркер
+    загружает только сессии своих пользователей (user_id % всего == номер).
+    """
+
+    def __init__(self, path, keys=SESSION_KEYS, idle_ttl=30 * 86400, update_interval=60, shard=None):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.path = path
+        self.keys = keys
+        self.idle_ttl = idle_ttl
+        self.shard = shard
+
+        # Одно соединение и один поток: SQLite не любит запись из разных потоков
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sessions')
+        self._connection = None
+
+        # user_id -> (последняя записанная сессия, время записи):
+        # неизменённые сессии не пишутся, пока не пора отметить активность
+        self._saved = {}
+        # user_id -> сессия для записи (None - удалить)
+        self._dirty = {}
+        self._writer = None
+
+        self.writes = 0
+        self.batches = 0
+        self.evicted = 0
+
+    # ---------- работа с базой (в потоке хранилища) ----------
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def _shard_filter(self):
+        # База общая для воркеров: каждый удаляет только сессии своих пользователей
+        if self.shard is None:
+            return "", ()
+        index, count = self.shard
+        return " AND user_id % ? = ?", (count, index)
+
+    def _load(self):
+        connection = self._connect()
+        condition, args = self._shard_filter()
+        with connection:
+            connection.execute(f"DELETE FROM sessions WHERE updated_at < ?{condition}",
+                               (time.time() - self.idle_ttl, *args))
+        return connection.execute("SELECT user_id, data, updated_at FROM sessions").fetchall()
+
+    def _write(self, batch):
+        connection = self._connect()
+        now = time.time()
+        with connection:
+            connection.executemany(
+                "INSERT INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                [(user_id, data, now) for user_id, data in batch.items() if data is not None],
+            )
+            connection.executemany(
+                "DELETE FROM sessions WHERE user_id = ?",
+                [(user_id,) for user_id, data in batch.items() if data is None],
+            )
+
+    def _evict(self, cutoff):
+        connection = self._connect()
+        condition, args = self._shard_filter()
+        with connection:
+            rows = connection.execute(
+                f"DELETE FROM sessions WHERE updated_at < ?{condition} RETURNING user_id", (cutoff, *args)
+            ).fetchall()
+        return [user_id for (user_id,) in rows]
+
+    def _owns(self, user_id):
+        if self.shard is None:
+            return True
+        index, count = self.shard
+        return user_id % count == index
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    # ---------- пакетная запись ----------
+
+    def _mark(self, user_id, data):
+        self._dirty[user_id] = data
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_dirty())
+
+    async def _write_dirty(self):
+        # Ждём один проход цикла событий: Application передаёт всех
+        # пользователей сразу, и они попадают в одну транзакцию
+        await asyncio.sleep(0)
+
+        while self._dirty:
+            batch, self._dirty = self._dirty, {}
+            try:
+                await self._run(self._write, batch)
+            except sqlite3.Error as e:
+                print(f"Ошибка записи сессий: {e}")
+                # Не потерять изменения: вернём их в очередь до следующего раза
+                self._dirty = {**batch, **self._dirty}
+                return
+
+            self.writes += len(batch)
+            self.batches += 1
+
+    # ---------- интерфейс BasePersistence ----------
+
+    async def get_user_data(self):
+        rows = await self._run(self._load)
+
+        user_data = {}
+        for user_id, data, updated_at in rows:
+            if not self._owns(user_id):
+                continue
+            try:
+                user_data[user_id] = decode_session(data)
+            except ValueError:
+                continue
+            self._saved[user_id] = (data, updated_at)
+        return user_data
+
+    async def update_user_data(self, user_id, data):
+        session = encode_session(data, self.keys)
+        saved, updated_at = self._saved.get(user_id, (None, 0.0))
+
+        # Активность отмечаем с точностью до десятой части idle_ttl
+        now = time.time()
+        if session == saved and (session is None or now - updated_at < self.idle_ttl / 10):
+            return
+
+        if session is None:
+            self._saved.pop(user_id, None)
+        else:
+            self._saved[user_id] = (session, now)
+        self._mark(user_id, session)
+
+    async def drop_user_data(self, user_id):
+        self._saved.pop(user_id, None)
+        self._mark(user_id, None)
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def evict_idle(self):
+        """
+        Удаление сессий, не менявшихся дольше idle_ttl. Возвращает их user_id
+        """
+        user_ids = [user_id for user_id in await self._run(self._evict, time.time() - self.idle_ttl)
+                    if self._owns(user_id)]
+        for user_id in user_ids:
+            self._saved.pop(user_id, None)
+        self.evicted += len(user_ids)
+        return user_ids
+
+    async def flush(self):
+        if self._writer is not None:
+            await self._writer
+        if self._dirty:
+            await self._write_dirty()
+
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=True)
+
+    # Остальные данные бот не хранит
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
@@ -0,0 +1,109 @@
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+# ========================================
+# НЕИЗМЕНЯЕМЫЙ СНИМОК ТОРГОВОЙ ДОСКИ
+# ========================================
+
+class BoardSnapshot:
+    """
+    Версионированный снимок торговой доски, общий для всех пользователей.
+
+    Снимок не изменяется после создания: пользователи хранят только его
+    версию и номера строк, а поиск бумаги по SECID идёт через хэш-индекс.
+    """
+
+    def __init__(self, df, version, fetched_at=None):
+        self.version = version
+        # Время получения данных с биржи (Unix time)
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+
+        # Производные данные, которые живут ровно столько же, сколько снимок
+        # (например, уже отформатированные сообщения). Загрузчик может передать
+        # уже посчитанные в df.attrs['memo']; из attrs их убираем, иначе pandas
+        # копирует их при каждой операции с таблицей
+        self.memo = dict(df.attrs.pop('memo', None) or {})
+
+        # Позиционный индекс 0..N-1: номера строк совпадают с метками.
+        # Без copy-on-write reset_index копирует все колонки, поэтому
+        # таблицу с таким индексом (снимок из общего файла) берём как есть
+        if df.index.equals(pd.RangeIndex(len(df))):
+            self.df = df
+        else:
+            self.df = df.reset_index(drop=True)
+
+        # SECID -> номер строки
+        self._positions = {secid: pos for pos, secid in enumerate(self.df['SECID'])}
+
+    def __len__(self):
+        return len(self.df)
+
+    def __contains__(self, secid):
+        return secid in self._positions
+
+    def position(self, secid):
+        """
+        Номер строки бумаги в снимке (None, если бумаги нет)
+        """
+        return self._positions.get(secid)
+
+    def lookup(self, secid):
+        """
+        Строка бумаги в виде DataFrame из одной строки (пустой, если бумаги нет)
+        """
+        pos = self._positions.get(secid)
+        if pos is None:
+            return pd.DataFrame()
+        return self.df.iloc[[pos]]
+
+    def take(self, positions):
+        """
+        Строки снимка по номерам, перенумерованные с нуля
+        """
+        return self.df.iloc[list(positions)].reset_index(drop=True)
+
+
+# ========================================
+# СОХРАНЕНИЕ СНИМКА НА ДИСК
+# ========================================
+
+def save_snapshot(snapshot, path):
+    """
+    Сохранение снимка в файл Feather вместе со временем его получения.
+
+    Файл сначала пишется рядом и затем атомарно подменяет старый,
+    чтобы при сбое на диске не остался недописанный снимок
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    table = pa.Table.from_pandas(snapshot.df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), b'fetched_at': str(snapshot.fetched_at).encode()}
+    table = table.replace_schema_metadata(metadata)
+
+    tmp_path = f"{path}.tmp"
+    feather.write_feather(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """
+    Чтение сохранённого снимка: (DataFrame, время получения) или None
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        table = feather.read_table(path, memory_map=True)
+        fetched_at = float(table.schema.metadata[b'fetched_at'])
+        return table.to_pandas(), fetched_at
+
+    except Exception as e:
+        print(f"Не удалось прочитать сохранённый снимок {path}: {e}")
+        return None
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+# ========================================
+# ПАРАЛЛЕЛЬНАЯ ОБРАБОТКА ОБНОВЛЕНИЙ
+# ========================================
+
+def update_chat_key(update):
+    """
+    Ключ очереди обновления: чат, а для inline-запросов - пользователь.
+    None - обновление можно обрабатывать без очереди
+    """
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обновления разных чатов обрабатываются параллельно, но не больше
+    max_workers одновременно; обновления одного чата - строго по очереди
+    (обновить -> открыть бумагу -> назад к списку).
+
+    Обновление сначала встаёт в цепочку своего чата и только когда предыдущее
+    обновление чата завершилось, занимает воркер. Поэтому ожидание своей
+    очереди не отнимает воркеры у других чатов. max_pending ограничивает
+    число принятых, но ещё не завершённых обновлений.
+    """
+
+    def __init__(self, max_workers=8, max_pending=256, window=1000):
+        super().__init__(max_pending)
+        self.max_workers = max_workers
+
+        self._workers = None
+        # Ключ чата -> future последнего принятого обновления этого чата
+        self._tails = {}
+
+        self.waiting = 0
+        self.running = 0
+        self.processed = 0
+
+        # Время от приёма обновления до начала обработки, секунд (последние window)
+        self._waits = deque(maxlen=window)
+        self.max_wait = 0.0
+
+    async def initialize(self):
+        self._workers = asyncio.Semaphore(self.max_workers)
+
+    async def shutdown(self):
+        self._tails.clear()
+
+    async def do_process_update(self, update, coroutine):
+        accepted = time.monotonic()
+        key = update_chat_key(update)
+
+        # Встаём в цепочку чата сразу, без await: порядок в цепочке - порядок приёма
+        previous = None
+        done = None
+        if key is not None:
+            previous = self._tails.get(key)
+            done = asyncio.get_running_loop().create_future()
+            self._tails[key] = done
+
+        self.waiting += 1
+        started = False
+        try:
+            if previous is not None:
+                # shield: отмена этого обновления не должна отменять ожидание других
+                await asyncio.shield(previous)
+
+            async with self._workers:
+                self.waiting -= 1
+                started = True
+                self._record_wait(time.monotonic() - accepted)
+
+                self.running += 1
+                try:
+                    await coroutine
+                finally:
+                    self.running -= 1
+                    self.processed += 1
+
+        finally:
+            if not started:
+                self.waiting -= 1
+                # Обработчик так и не запустился - закрываем корутину, чтобы не было предупреждения
+                coroutine.close()
+
+            if done is not None:
+                if not done.done():
+                    done.set_result(None)
+                if self._tails.get(key) is done:
+                    del self._tails[key]
+
+    def _record_wait(self, wait):
+        self._waits.append(wait)
+        self.max_wait = max(self.max_wait, wait)
+
+    def stats(self):
+        waits = np.fromiter(self._waits, dtype=float, count=len(self._waits))
+        return {
+            'workers': self.max_workers,
+            'running': self.running,
+            'waiting': self.waiting,
+            'chats': len(self._tails),
+            'processed': self.processed,
+            'avg_wait': float(waits.mean()) if waits.size else 0.0,
+            'p95_wait': float(np.percentile(waits, 95)) if waits.size else 0.0,
+            'max_wait': self.max_wait,
+        }
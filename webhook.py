@@ -0,0 +1,221 @@
+import asyncio
+import contextlib
+import hmac
+import json
+import secrets
+import signal
+from http import HTTPStatus
+
+from telegram import Update
+
+
+# ========================================
+# ПРИЁМ ОБНОВЛЕНИЙ ЧЕРЕЗ WEBHOOK
+# ========================================
+
+# Заголовок, в котором Telegram присылает secret_token из setWebhook
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+
+# Telegram держит соединение открытым и шлёт обновления подряд;
+# неактивное соединение закрываем через столько секунд
+KEEP_ALIVE_TIMEOUT = 75
+
+# Обновление Telegram заведомо меньше
+MAX_BODY_SIZE = 1 << 20
+
+
+class WebhookServer:
+    """
+    Минимальный HTTP/1.1 сервер на asyncio для webhook Telegram.
+
+    Принимает только POST на url_path с правильным секретным токеном
+    (без токена сервер не создаётся),
+    разбирает тело в Update и кладёт его в очередь обновлений Application -
+    дальше обновление обрабатывается так же, как при long polling.
+    Вместо Application подойдёт любой объект с bot и update_queue.
+    """
+
+    def __init__(self, application, url_path='/telegram', secret_token=None):
+        if not secret_token:
+            raise ValueError("Webhook без секретного токена принимал бы обновления от кого угодно")
+
+        self.application = application
+        self.url_path = url_path
+        self.secret_token = secret_token
+
+        self._server = None
+        self._writers = set()
+
+        self.received = 0
+        self.rejected = 0
+
+    async def start(self, host='0.0.0.0', port=8443):
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # Открытые keep-alive соединения закрываем сами, иначе остановка их дождётся
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                request = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                if request is None:
+                    break
+
+                status, keep_alive = await self._handle(*request)
+                await self._respond(writer, status, keep_alive)
+                if not keep_alive:
+                    break
+
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader):
+        """
+        Запрос: (метод, путь, заголовки, тело) или None, если соединение закрыто
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+
+        method, target, version = request_line.decode('latin-1').split()
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY_SIZE:
+            raise ValueError("Слишком большое тело запроса")
+        body = await reader.readexactly(length) if length else b''
+
+        headers[':version'] = version
+        return method, target, headers, body
+
+    async def _handle(self, method, target, headers, body):
+        keep_alive = headers.get('connection', '').lower() != 'close' and headers[':version'] == 'HTTP/1.1'
+
+        if target.split('?')[0] != self.url_path:
+            return HTTPStatus.NOT_FOUND, keep_alive
+        if method != 'POST':
+            return HTTPStatus.METHOD_NOT_ALLOWED, keep_alive
+
+        token = headers.get(SECRET_HEADER, '')
+        if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+            self.rejected += 1
+            return HTTPStatus.FORBIDDEN, keep_alive
+
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            print(f"Некорректное обновление webhook: {e}")
+            return HTTPStatus.BAD_REQUEST, keep_alive
+
+        self.received += 1
+        await self.application.update_queue.put(update)
+        return HTTPStatus.OK, keep_alive
+
+    async def _respond(self, writer, status, keep_alive):
+        connection = 'keep-alive' if keep_alive else 'close'
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: {connection}\r\n\r\n".encode('latin-1')
+        )
+        await writer.drain()
+
+
+def webhook_secret(secret_token, webhook_url):
+    """
+    Секретный токен webhook. Если адрес регистрируется при запуске, без
+    заданного токена используется случайный. Если адрес регистрируется
+    вручную, токен обязателен: иначе Telegram не знает, что присылать
+    """
+    if secret_token:
+        return secret_token
+    if webhook_url:
+        return secrets.token_urlsafe(32)
+    raise ValueError("Для webhook без --webhook-url задайте WEBHOOK_SECRET (тот же, что в setWebhook)")
+
+
+def stop_signal():
+    """
+    Событие, которое устанавливается по SIGINT/SIGTERM
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    return stop
+
+
+@contextlib.asynccontextmanager
+async def application_running(application):
+    """
+    Жизненный цикл Application как у run_polling: initialize, post_init, start,
+    а на выходе - остановка с post_stop и post_shutdown
+    """
+    await application.initialize()
+    if application.post_init is not None:
+        await application.post_init(application)
+
+    try:
+        await application.start()
+        yield application
+
+    finally:
+        if application.running:
+            await application.stop()
+        if application.post_stop is not None:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown is not None:
+            await application.post_shutdown(application)
+
+
+async def run_webhook(application, listen, port, url_path, webhook_url=None, secret_token=None,
+                      allowed_updates=None):
+    """
+    Запуск Application в режиме webhook до SIGINT/SIGTERM.
+
+    Если задан webhook_url, адрес регистрируется в Telegram вместе
+    с секретным токеном (если токен не задан - со случайным на время запуска).
+    Без адреса и токена не запускается
+    """
+    secret_token = webhook_secret(secret_token, webhook_url)
+
+    stop = stop_signal()
+    server = WebhookServer(application, url_path=url_path, secret_token=secret_token)
+
+    async with application_running(application):
+        try:
+            await server.start(listen, port)
+
+            if webhook_url:
+                await application.bot.set_webhook(
+                    webhook_url.rstrip('/') + url_path,
+                    secret_token=secret_token,
+                    allowed_updates=allowed_updates,
+                )
+
+            print(f"🌐 Webhook слушает {listen}:{port}{url_path}")
+            await stop.wait()
+
+        finally:
+            await server.close()
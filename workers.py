@@ -0,0 +1,263 @@
+import asyncio
+import glob
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from telegram import Update
+
+from update_processor import update_chat_key
+from webhook import WebhookServer, application_running, stop_signal, webhook_secret
+
+
+# ========================================
+# ОБЩИЙ СНИМОК ДОСКИ ДЛЯ НЕСКОЛЬКИХ ПРОЦЕССОВ
+# ========================================
+
+# Файл с номером текущей версии: подменяется атомарно после записи снимка
+CURRENT_FILE = 'CURRENT'
+
+
+def _snapshot_path(directory, version):
+    return os.path.join(directory, f'board-{version:010d}.arrow')
+
+
+def _read_current(directory):
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _arrow_table(df):
+    # Производные данные снимка (df.attrs) в файл не попадают: воркер считает их сам
+    plain = df.copy(deep=False)
+    plain.attrs = {}
+    table = pa.Table.from_pandas(plain, preserve_index=False)
+
+    # Числа без маски пропусков (NaN остаётся значением): такие колонки
+    # читаются из отображённого файла в pandas без копирования
+    for i, column in enumerate(df.columns):
+        dtype = df[column].dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in 'fiub':
+            table = table.set_column(i, table.field(i), pa.array(df[column].to_numpy()))
+    return table
+
+
+class SharedSnapshotWriter:
+    """
+    Публикация снимков доски для процессов-воркеров.
+
+    Каждая версия - отдельный несжатый файл Arrow IPC (колонки лежат
+    в файле так же, как в памяти); номер текущей версии - в файле CURRENT,
+    который подменяется только после того, как снимок целиком записан.
+    Старые версии удаляются: воркеры, которые их ещё читают, держат
+    отображение и не замечают удаления.
+    """
+
+    def __init__(self, directory, keep_versions=3):
+        self.directory = directory
+        self.keep_versions = keep_versions
+        os.makedirs(directory, exist_ok=True)
+
+        # Нумерация продолжается после перезапуска, чтобы воркеры увидели новый снимок
+        self.version = _read_current(directory) or 0
+
+    def publish(self, df, fetched_at):
+        """
+        Запись нового снимка. Возвращает его версию
+        """
+        version = self.version + 1
+
+        table = _arrow_table(df)
+        metadata = {**(table.schema.metadata or {}), b'fetched_at': str(fetched_at).encode()}
+        table = table.replace_schema_metadata(metadata)
+
+        path = _snapshot_path(self.directory, version)
+        with pa.OSFile(f"{path}.tmp", 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(f"{path}.tmp", path)
+
+        current = os.path.join(self.directory, CURRENT_FILE)
+        with open(f"{current}.tmp", 'w') as f:
+            f.write(str(version))
+        os.replace(f"{current}.tmp", current)
+        self.version = version
+
+        for old in sorted(glob.glob(os.path.join(self.directory, 'board-*.arrow')))[:-self.keep_versions]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+        return version
+
+
+def enable_copy_on_write():
+    """
+    Copy-on-write для pandas 2.x (в pandas 3 он включён всегда): иначе
+    операции с таблицей воркера копируют колонки, отображённые из общего файла
+    """
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.set_option('mode.copy_on_write', True)
+
+
+class SharedSnapshotReader:
+    """
+    Чтение опубликованных снимков в воркере: файл отображается в память
+    только для чтения, и числовые колонки DataFrame ссылаются прямо на него -
+    страницы снимка общие для всех процессов
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.version = None
+        self.reads = 0
+
+    def changed(self):
+        current = _read_current(self.directory)
+        return current is not None and current != self.version
+
+    def read(self):
+        """
+        Новый снимок: (DataFrame, время получения) или None, если версия не менялась
+        """
+        version = _read_current(self.directory)
+        if version is None or version == self.version:
+            return None
+
+        source = pa.memory_map(_snapshot_path(self.directory, version), 'r')
+        table = pa.ipc.open_file(source).read_all()
+        fetched_at = float(table.schema.metadata[b'fetched_at'])
+
+        df = table.to_pandas(split_blocks=True)
+        self.version = version
+        self.reads += 1
+        return df, fetched_at
+
+
+# ========================================
+# РАСПРЕДЕЛЕНИЕ ОБНОВЛЕНИЙ ПО ВОРКЕРАМ
+# ========================================
+
+def worker_for(update, count):
+    """
+    Номер воркера для обновления: все обновления одного чата
+    попадают в один воркер (порядок и user_data остаются в одном процессе)
+    """
+    key = update_chat_key(update)
+    return key % count if key is not None else 0
+
+
+class UpdateRouter:
+    """
+    Приёмник обновлений в процессе-распределителе: вместо очереди
+    Application раскладывает обновления по очередям воркеров.
+    Подходит для WebhookServer как application (есть bot и update_queue)
+    """
+
+    def __init__(self, bot, queues):
+        self.bot = bot
+        self.queues = queues
+        self.update_queue = self
+
+        self.routed = [0] * len(queues)
+
+    async def put(self, update):
+        index = worker_for(update, len(self.queues))
+        self.queues[index].put(update.to_dict())
+        self.routed[index] += 1
+
+
+async def run_router(bot, queues, mode='polling', listen='0.0.0.0', port=8443, url_path='/telegram',
+                     webhook_url=None, secret_token=None, allowed_updates=None, poll_timeout=30):
+    """
+    Получение обновлений (long polling или webhook) и раздача их воркерам до SIGINT/SIGTERM
+    """
+    if mode == 'webhook':
+        secret_token = webhook_secret(secret_token, webhook_url)
+
+    router = UpdateRouter(bot, queues)
+    stop = stop_signal()
+
+    async with bot:
+        if mode == 'webhook':
+            server = WebhookServer(router, url_path=url_path, secret_token=secret_token)
+            await server.start(listen, port)
+            if webhook_url:
+                await bot.set_webhook(webhook_url.rstrip('/') + url_path, secret_token=secret_token,
+                                      allowed_updates=allowed_updates)
+            print(f"🌐 Webhook слушает {listen}:{port}{url_path}, воркеров: {len(queues)}")
+            try:
+                await stop.wait()
+            finally:
+                await server.close()
+            return
+
+        await bot.delete_webhook()
+        print(f"📡 Long polling, воркеров: {len(queues)}")
+        offset = None
+        while not stop.is_set():
+            polling = asyncio.ensure_future(bot.get_updates(offset=offset, timeout=poll_timeout,
+                                                            allowed_updates=allowed_updates))
+            stopping = asyncio.ensure_future(stop.wait())
+            await asyncio.wait([polling, stopping], return_when=asyncio.FIRST_COMPLETED)
+            stopping.cancel()
+
+            if not polling.done():
+                polling.cancel()
+                break
+
+            try:
+                updates = polling.result()
+            except Exception as e:
+                print(f"Ошибка получения обновлений: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for update in updates:
+                await router.put(update)
+                offset = update.update_id + 1
+
+        # Подтверждаем полученные обновления, чтобы после перезапуска они не пришли снова
+        if offset is not None:
+            try:
+                await bot.get_updates(offset=offset, timeout=0)
+            except Exception as e:
+                print(f"Не удалось подтвердить обновления: {e}")
+
+
+async def run_worker(application, queue):
+    """
+    Запуск Application в воркере: обновления приходят из очереди распределителя.
+    Жизненный цикл тот же, что у run_polling; остановка - по SIGINT/SIGTERM
+    или по None в очереди
+    """
+    loop = asyncio.get_running_loop()
+    stop = stop_signal()
+
+    def receive(data):
+        if data is None:
+            stop.set()
+            return
+        # Update собирается уже в цикле событий, с ботом этого воркера
+        application.update_queue.put_nowait(Update.de_json(data, application.bot))
+
+    def pump():
+        while True:
+            data = queue.get()
+            try:
+                loop.call_soon_threadsafe(receive, data)
+            except RuntimeError:
+                # Цикл событий уже закрыт - воркер останавливается
+                return
+            if data is None:
+                return
+
+    async with application_running(application):
+        threading.Thread(target=pump, name='updates', daemon=True).start()
+        await stop.wait()